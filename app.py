@@ -0,0 +1,21 @@
+"""
+Application unique regroupant les trois versions de l'API :
+
+    /v1  comportement de main.py  (images, analyse de personnalité, matching)
+    /v2  comportement de main1.py (tests comportementaux à options mélangées)
+    /v3  comportement de main2.py (tests sur échelle de Likert)
+
+    uvicorn app:app
+
+Un seul processus, un seul pool de connexions amont (voir llm.get_http_client).
+"""
+import main
+import main1
+import main2
+from server import create_app
+
+app = create_app({
+    "/v1": main.router,
+    "/v2": main1.router,
+    "/v3": main2.router,
+})
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from fastjson import dumps
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+
+
+# === EXÉCUTION EN ÉVENTAIL ===
+
+async def fan_out(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    timeout: float,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Exécute `worker` sur chaque élément avec au plus `concurrency` appels simultanés
+    et un délai maximal par élément. Produit les couples (index, résultat) dans
+    l'ordre de terminaison ; un échec n'interrompt pas le reste du lot.
+    """
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def run(index: int, item: Any) -> Tuple[int, Dict[str, Any]]:
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(worker(item), timeout)
+            except asyncio.TimeoutError:
+                return index, {"error": f"Délai dépassé ({timeout:g} s)"}
+            except Exception as e:
+                return index, {"error": str(e)}
+        return index, result
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_ordered(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    timeout: float,
+) -> List[Dict[str, Any]]:
+    """Comme `fan_out`, mais renvoie tous les résultats dans l'ordre d'entrée."""
+    results: List[Dict[str, Any]] = [{} for _ in items]
+    async for index, result in fan_out(items, worker, concurrency, timeout):
+        results[index] = result
+    return results
+
+
+async def ndjson_lines(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    timeout: float,
+    describe: Callable[[int], Dict[str, Any]],
+) -> AsyncIterator[bytes]:
+    """Une ligne JSON par élément terminé, annotée par `describe(index)`."""
+    async for index, result in fan_out(items, worker, concurrency, timeout):
+        line = {**describe(index), **result_entry(result)}
+        yield dumps(line) + b"\n"
+
+
+def result_entry(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Sépare les échecs (`error`) des résultats valides pour le rapport du lot."""
+    if "error" in result:
+        return {"ok": False, "error": result["error"]}
+    return {"ok": True, "resultat": result}
@@ -0,0 +1,895 @@
+"""
+Benchmarks et tests de charge locaux.
+
+    python bench.py load --delay 0.2 --requests 400 --concurrency 1 10 100 400
+    python bench.py startup --repeat 5
+    python bench.py extraction --fuzz 2000
+    python bench.py tokens --calls 20 [--live]
+    python bench.py personality --candidates 200 --images 5
+    python bench.py endpoints --latency 0.05 --distribution lognormale --requests 200
+    python bench.py cascade --pairs 300 --band 40-75
+    python bench.py scoring --candidates 100000 --questions 15
+    python bench.py shared-cache --workers 4 --requests 5000 --keys 5000
+    python bench.py near-dup --cvs 100000 --offres 50 --queries 2000
+    python bench.py serialization --requests 200 --candidates 2000 --cvs 200
+
+Aucun appel réel n'est effectué : un faux serveur compatible OpenAI est lancé
+en local et les clients de `llm` sont redirigés vers lui, ou (`endpoints`) le
+backend local de `stub_backend` remplace le modèle dans le processus.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from stub_backend import FAKE_PNG, count_tokens, fake_content, fake_questions
+
+# === FAUX SERVEUR AMONT ===
+
+# Tokens facturés par le faux amont depuis son démarrage
+FAKE_USAGE = {"appels": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def _completion_body(content: str, prompt_tokens: int) -> bytes:
+    completion_tokens = count_tokens(content)
+    FAKE_USAGE["appels"] += 1
+    FAKE_USAGE["prompt_tokens"] += prompt_tokens
+    FAKE_USAGE["completion_tokens"] += completion_tokens
+    return json.dumps({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }).encode()
+
+
+def _stream_chunks(content: str, size: int = 16):
+    """Événements SSE `chat.completion.chunk` découpant `content` en morceaux."""
+    for start in range(0, len(content), size):
+        event = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(event)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+
+def _images_body(port: int) -> bytes:
+    return json.dumps({
+        "created": int(time.time()),
+        "data": [{"url": f"http://127.0.0.1:{port}/fake.png"}],
+    }).encode()
+
+
+async def start_fake_upstream(delay: float, port: int = 0, token_delay: float = 0.0):
+    """
+    Serveur HTTP/1.1 minimal (keep-alive) qui répond après `delay` secondes, plus
+    `token_delay` secondes par token de sortie.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = dict(
+                    line.split(":", 1) for line in header_lines if ":" in line
+                )
+                length = int(headers.get("Content-Length", headers.get("content-length", "0")))
+                request = json.loads(await reader.readexactly(length)) if length else {}
+
+                content = fake_content(
+                    request.get("messages", []), request.get("response_format"), model=request.get("model", "")
+                )
+                await asyncio.sleep(delay + token_delay * count_tokens(content))
+
+                if request.get("stream"):
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\n"
+                        b"Content-Type: text/event-stream\r\n"
+                        b"Transfer-Encoding: chunked\r\n\r\n"
+                    )
+                    for event in _stream_chunks(content):
+                        writer.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                        await writer.drain()
+                        await asyncio.sleep(delay / 50)
+                    writer.write(b"0\r\n\r\n")
+                    await writer.drain()
+                    continue
+
+                if request_line.startswith("GET /fake.png"):
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\n"
+                        b"Content-Type: image/png\r\n"
+                        b"Content-Length: " + str(len(FAKE_PNG)).encode() + b"\r\n\r\n" + FAKE_PNG
+                    )
+                    await writer.drain()
+                    continue
+                if "/images/" in request_line:
+                    body = _images_body(writer.get_extra_info("sockname")[1])
+                else:
+                    messages = request.get("messages", [])
+                    body = _completion_body(
+                        content, sum(count_tokens(m.get("content", "")) for m in messages)
+                    )
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+# === TEST DE CHARGE ===
+
+MATCH_PAYLOAD = {
+    "cv": "Développeur Python, 5 ans d'expérience FastAPI et PostgreSQL.",
+    "offre": {
+        "poste": "Développeur backend",
+        "description": "API REST en Python",
+        "niveauExperience": "3 ans",
+        "niveauEtude": "Bac+5",
+        "responsabilite": "Concevoir et maintenir les API",
+        "experience": "3 ans minimum",
+        "pays": "Tunisie",
+        "ville": "Tunis",
+    },
+}
+
+
+async def run_load(args):
+    import httpx
+
+    # Mesure du client asynchrone, pas de l'ordonnanceur : budgets et concurrence amont levés
+    _local_state()
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(max(args.concurrency)))
+    server, port = await start_fake_upstream(args.delay)
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{port}"
+
+    import main1
+
+    transport = httpx.ASGITransport(app=main1.app)
+    async with server, httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        print(f"Amont simulé : {args.delay * 1000:.0f} ms par appel, {args.requests} requêtes")
+        print(f"{'concurrence':>12} {'durée (s)':>10} {'req/s':>10} {'accélération':>13}")
+        baseline = None
+        for concurrency in args.concurrency:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                # CV distinct à chaque requête pour ne pas mesurer le cache
+                payload = dict(MATCH_PAYLOAD, cv=f"{MATCH_PAYLOAD['cv']} #{concurrency}-{i}")
+                async with semaphore:
+                    response = await http.post("/match-cv-offre", json=payload)
+                    response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - start
+            rate = args.requests / elapsed
+            baseline = baseline or rate
+            print(f"{concurrency:>12} {elapsed:>10.2f} {rate:>10.1f} {rate / baseline:>12.1f}x")
+
+
+# === DÉMARRAGE ===
+
+_STARTUP_PROBE = (
+    "import resource, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def _measure_startup(module: str, repeat: int):
+    """Temps d'import médian (s) et mémoire résidente max (Mio) d'un processus neuf."""
+    durations, rss = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE.format(module=module)],
+            capture_output=True, text=True, check=True,
+            env={**os.environ, "API_KEY": os.environ.get("API_KEY", "bench")},
+        ).stdout.split()
+        durations.append(float(output[-2]))
+        rss.append(int(output[-1]) / 1024)
+    return statistics.median(durations), statistics.median(rss)
+
+
+async def run_startup(args):
+    print(f"{'déploiement':<28} {'processus':>9} {'démarrage (s)':>14} {'RSS (Mio)':>10} {'pools amont':>12}")
+    separate = [_measure_startup(module, args.repeat) for module in ("main", "main1", "main2")]
+    print(f"{'main + main1 + main2':<28} {3:>9} {sum(d for d, _ in separate):>14.2f} "
+          f"{sum(r for _, r in separate):>10.0f} {3:>12}")
+    duration, rss = _measure_startup("app", args.repeat)
+    print(f"{'app (/v1, /v2, /v3)':<28} {1:>9} {duration:>14.2f} {rss:>10.0f} {1:>12}")
+
+
+# === EXTRACTION ===
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_corpus", "malformed_outputs.jsonl")
+
+
+def _legacy_parse(raw: str):
+    """Ancien chemin : retrait des balises par regex puis json.loads (tout ou rien)."""
+    try:
+        return json.loads(re.sub(r"^```json\s*|```$", "", raw.strip(), flags=re.MULTILINE))
+    except json.JSONDecodeError:
+        return None
+
+
+def _fuzz_corpus(count: int, seed: int):
+    """Réponses de test bruitées : balises, prose autour, troncature aléatoire."""
+    rng = random.Random(seed)
+    pretty = json.dumps(fake_questions(rng), ensure_ascii=False, indent=rng.choice([None, 2, 4]))
+    for _ in range(count):
+        raw = pretty
+        if rng.random() < 0.5:
+            raw = raw[: rng.randrange(len(raw))]
+        if rng.random() < 0.3:
+            raw = "```json\n" + raw + "\n```"
+        if rng.random() < 0.3:
+            raw = "Voici le test :\n" + raw
+        if rng.random() < 0.2:
+            raw += "\nBonne chance [au candidat] !"
+        yield {"type": "questions", "cas": "fuzz", "raw": raw}
+
+
+async def run_extraction(args):
+    from extraction import extract_array, extract_json, validate_items
+    from schemas import MatchResult, QuestionOutput
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f]
+    cases = corpus + list(_fuzz_corpus(args.fuzz, args.seed))
+
+    def new_parse(case):
+        if case["type"] == "match":
+            try:
+                return [MatchResult.model_validate(extract_json(case["raw"]))]
+            except ValueError:
+                return []
+        items, _ = extract_array(case["raw"])
+        return validate_items(items, QuestionOutput)[0]
+
+    def old_parse(case):
+        value = _legacy_parse(case["raw"])
+        if case["type"] == "match":
+            return [value] if isinstance(value, dict) else []
+        return value if isinstance(value, list) else []
+
+    print(f"{len(corpus)} réponses du corpus + {args.fuzz} réponses bruitées")
+    print(f"{'méthode':<22} {'réponses exploitées':>20} {'éléments récupérés':>19} {'µs/réponse':>11}")
+    for name, parse in (("regex + json.loads", old_parse), ("extraction tolérante", new_parse)):
+        start = time.perf_counter()
+        results = [parse(case) for case in cases]
+        elapsed = time.perf_counter() - start
+        usable = sum(1 for r in results if r)
+        print(f"{name:<22} {usable:>20} {sum(map(len, results)):>19} {elapsed / len(cases) * 1e6:>11.1f}")
+
+    mismatches = [c["cas"] for c in corpus if len(new_parse(c)) != c["attendus"]]
+    print("Corpus : " + (f"écarts sur {', '.join(mismatches)}" if mismatches else "tous les cas attendus sont récupérés"))
+
+
+# === TOKENS DE SORTIE ===
+
+TEST_PAYLOAD = {
+    "poste": "Développeur backend",
+    "description": "API REST en Python",
+    "typeTravail": "CDI",
+    "niveauExperience": "3 ans",
+    "responsabilite": "Concevoir et maintenir les API",
+    "experience": "3 ans minimum",
+    "ouverture": 3, "conscience": 3, "extraversion": 3, "agreabilite": 3, "stabilite": 3,
+}
+
+
+async def run_tokens(args):
+    server = None
+    if not args.live:
+        server, port = await start_fake_upstream(args.delay, token_delay=args.token_delay)
+        os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{port}"
+        os.environ.setdefault("API_KEY", "bench")
+
+    import llm
+    from extraction import extract_array, extract_json
+    from prompts import TEMPLATES
+    from schemas import MATCH_SCHEMA, QUESTIONS_SCHEMA
+
+    cases = [
+        ("match", TEMPLATES["main1_match"].messages(cv=MATCH_PAYLOAD["cv"], fragment=json.dumps(MATCH_PAYLOAD["offre"], ensure_ascii=False)),
+         500, "match", MATCH_SCHEMA, extract_json),
+        ("generate_test", TEMPLATES["main1_test"].messages(**TEST_PAYLOAD),
+         3000, "questions", QUESTIONS_SCHEMA, lambda content: extract_array(content)[0]),
+    ]
+    print(f"{'route':<14} {'mode':<12} {'tokens sortie':>14} {'latence (s)':>12} {'analysées':>10}")
+    try:
+        for route, messages, max_tokens, name, schema, parse in cases:
+            for mode in ("off", "json_object", "json_schema"):
+                llm.STRUCTURED_OUTPUT = mode
+                tokens, latencies, parsed = [], [], 0
+                for _ in range(args.calls):
+                    # Appel direct au client pour lire `usage` (tokens facturés)
+                    kwargs = {"response_format": llm.json_format(name, schema)} if mode != "off" else {}
+                    start = time.perf_counter()
+                    response = await llm.get_chat_client().chat.completions.create(
+                        model="gpt-4o", messages=messages, max_tokens=max_tokens, **kwargs
+                    )
+                    latencies.append(time.perf_counter() - start)
+                    content = response.choices[0].message.content
+                    tokens.append(response.usage.completion_tokens)
+                    try:
+                        parsed += bool(parse(content))
+                    except ValueError:
+                        pass
+                print(f"{route:<14} {mode:<12} {statistics.mean(tokens):>14.0f} "
+                      f"{statistics.mean(latencies):>12.3f} {parsed:>6}/{args.calls}")
+    finally:
+        await llm.close_clients()
+        if server is not None:
+            server.close()
+
+
+# === ANALYSE DE PERSONNALITÉ ===
+
+async def run_personality(args):
+    import httpx
+
+    server, port = await start_fake_upstream(args.delay, token_delay=args.token_delay)
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("API_KEY", "bench")
+    # Quotas locaux hors jeu : on mesure le chemin, pas le budget
+    os.environ.setdefault("LLM_RPM", "1000000")
+    os.environ.setdefault("LLM_TPM", "1000000000")
+
+    import main
+
+    items = [
+        {
+            "image_url": f"http://images/{i % args.images}.png",
+            "image_prompt": f"Scène professionnelle n°{i % args.images} : réunion d'équipe tendue",
+            "description": f"Candidat {i} : je vois une personne qui écoute ses collègues puis propose un plan d'action.",
+        }
+        for i in range(args.candidates)
+    ]
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with server, httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        async def one_by_one():
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(item):
+                async with semaphore:
+                    (await http.post("/analyze-personality", json=item)).raise_for_status()
+
+            await asyncio.gather(*(one(item) for item in items))
+
+        async def grouped():
+            response = await http.post(
+                "/analyze-personality/batch", json={"items": items, "concurrence": args.concurrency}
+            )
+            response.raise_for_status()
+
+        print(f"{args.candidates} candidats, {args.images} images, concurrence {args.concurrency}, "
+              f"amont simulé {args.delay * 1000:.0f} ms + {args.token_delay * 1000:.1f} ms/token")
+        print(f"{'chemin':<12} {'appels':>7} {'durée (s)':>10} {'candidats/s':>12} {'tokens/candidat':>16}")
+        for name, run in (("unitaire", one_by_one), ("groupé", grouped)):
+            before = dict(FAKE_USAGE)
+            start = time.perf_counter()
+            await run()
+            elapsed = time.perf_counter() - start
+            calls = FAKE_USAGE["appels"] - before["appels"]
+            tokens = (FAKE_USAGE["prompt_tokens"] + FAKE_USAGE["completion_tokens"]
+                      - before["prompt_tokens"] - before["completion_tokens"])
+            print(f"{name:<12} {calls:>7} {elapsed:>10.2f} {args.candidates / elapsed:>12.1f} "
+                  f"{tokens / args.candidates:>16.0f}")
+
+
+# === DÉBIT PAR ROUTE ===
+
+def _match_v1(i: int):
+    offre = {k: v for k, v in MATCH_PAYLOAD["offre"].items() if k != "poste"}
+    return {"cv": f"{MATCH_PAYLOAD['cv']} #{i}", "offre": offre}
+
+
+def _match(i: int):
+    return dict(MATCH_PAYLOAD, cv=f"{MATCH_PAYLOAD['cv']} #{i}")
+
+
+def _test(i: int):
+    # Poste distinct à chaque requête : la banque de questions ne répond pas à la place du modèle
+    offre = {k: TEST_PAYLOAD[k] for k in ("description", "typeTravail", "niveauExperience", "responsabilite", "experience")}
+    poids = {trait: TEST_PAYLOAD[trait] for trait in ("ouverture", "conscience", "extraversion", "agreabilite", "stabilite")}
+    return {"offre": dict(offre, poste=f"{TEST_PAYLOAD['poste']} {i}"), "poids": poids}
+
+
+def _personality(i: int):
+    return {
+        "image_url": "http://images/0.png",
+        "image_prompt": "Scène professionnelle : réunion d'équipe tendue",
+        "description": f"Candidat {i} : je vois une personne qui écoute ses collègues puis propose un plan d'action.",
+    }
+
+
+def _image_question(i: int):
+    return {"cv": f"{MATCH_PAYLOAD['cv']} #{i}", "offre": "Développeur backend Python en équipe agile"}
+
+
+ENDPOINTS = {
+    "main": [
+        ("/match-cv-offre", _match_v1),
+        ("/analyze-personality", _personality),
+        ("/generate-image-question", _image_question),
+    ],
+    "main1": [("/match-cv-offre", _match), ("/generate-test", _test), ("/generate-test/stream", _test)],
+    "main2": [("/match-cv-offre", _match), ("/generate-test", _test), ("/generate-test/stream", _test)],
+}
+
+
+def _local_state():
+    """État local (banque, index d'offres, images) dans un répertoire jetable, budgets amont levés."""
+    import tempfile
+
+    state = tempfile.mkdtemp(prefix="bench-")
+    os.environ["QUESTION_BANK_PATH"] = os.path.join(state, "question_bank.db")
+    os.environ["OFFRE_INDEX_DIR"] = os.path.join(state, "offres")
+    os.environ["IMAGE_STORE_DIR"] = os.path.join(state, "images")
+    os.environ.setdefault("API_KEY", "bench")
+    for prefix in ("LLM", "IMAGES"):
+        os.environ.setdefault(f"{prefix}_RPM", "1000000")
+        os.environ.setdefault(f"{prefix}_TPM", "1000000000")
+
+
+async def run_endpoints(args):
+    import importlib
+
+    import httpx
+
+    _local_state()
+    import llm
+    from stub_backend import StubBackend
+
+    llm.set_backend(StubBackend(args.seed, args.latency, args.distribution, args.token_latency))
+    print(f"Backend local : {args.latency * 1000:.0f} ms ({args.distribution}) + {args.token_latency * 1000:.1f} ms/token, "
+          f"{args.requests} requêtes par route, concurrence {args.concurrency}")
+    print(f"{'version':<7} {'route':<26} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'échecs':>7}")
+
+    for version in args.versions:
+        module = importlib.import_module(version)
+        transport = httpx.ASGITransport(app=module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            for path, payload in ENDPOINTS[version]:
+                semaphore = asyncio.Semaphore(args.concurrency)
+                latencies, failures = [], 0
+
+                async def one(i):
+                    nonlocal failures
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await http.post(path, json=payload(i))
+                        latencies.append(time.perf_counter() - start)
+                        failures += response.status_code != 200 or '"error"' in response.text
+
+                start = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(args.requests)))
+                elapsed = time.perf_counter() - start
+                quantiles = statistics.quantiles(latencies, n=20)
+                print(f"{version:<7} {path:<26} {args.requests / elapsed:>8.1f} "
+                      f"{statistics.median(latencies) * 1000:>9.1f} {quantiles[-1] * 1000:>9.1f} {failures:>7}")
+    await llm.close_clients()
+
+
+# === CASCADE DE MODÈLES ===
+
+async def run_cascade(args):
+    import tempfile
+
+    os.environ["OFFRE_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("LLM_RPM", "1000000")
+    os.environ.setdefault("LLM_TPM", "1000000000")
+
+    import llm
+    import main1
+    from matching import Matching, parse_band
+    from stub_backend import StubBackend
+
+    llm.set_backend(StubBackend(
+        args.seed, args.latency, "lognormale", model_latency={args.fast_model: args.fast_latency}
+    ))
+    offre = main1.Offre(**MATCH_PAYLOAD["offre"])
+    print(f"{args.pairs} couples, concurrence {args.concurrency}, {args.fast_model} ~{args.fast_latency * 1000:.0f} ms, "
+          f"gpt-4o ~{args.latency * 1000:.0f} ms, bande {args.band}")
+    print(f"{'mode':<10} {'couples/s':>10} {'latence (ms)':>13} {'escaladés':>10} {'coût (USD)':>11} {'écart bande':>12}")
+    for name, cascade_model in (("gpt-4o", ""), ("cascade", args.fast_model)):
+        matching = Matching("main1", main1.Offre, main1.offre_prompt, cascade_model=cascade_model, band=parse_band(args.band))
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                await matching.score(f"{MATCH_PAYLOAD['cv']} #{i}", offre)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.pairs)))
+        elapsed = time.perf_counter() - start
+        stats = matching.cascade_stats()
+        escalated = sum(n for decision, n in stats["decisions"].items() if decision != "rapide")
+        gap = stats["ecart_moyen_bande"]
+        print(f"{name:<10} {args.pairs / elapsed:>10.1f} {statistics.mean(latencies) * 1000:>13.0f} "
+              f"{escalated if cascade_model else '-':>10} {stats['cout_usd']:>11.4f} {f'{gap:.1f}' if gap is not None else '-':>12}")
+    print("Décisions :", stats["decisions"])
+
+
+# === CORRECTION DES TESTS ===
+
+def _tally(traits, poids, sheet):
+    """Ancien calcul côté client : un candidat à la fois, en Python pur."""
+    sums, counts = {}, {}
+    for trait, score in zip(traits, sheet):
+        if score:
+            sums[trait] = sums.get(trait, 0) + score
+            counts[trait] = counts.get(trait, 0) + 1
+    profile = {t: (sums[t] / counts[t] - 1) / 4 * 100 for t in sums}
+    weight = sum(poids[t] for t in profile)
+    return sum(profile[t] * poids[t] for t in profile) / weight if weight else None
+
+
+async def run_scoring(args):
+    import numpy as np
+
+    from question_bank import TRAITS
+    from scoring import answer_matrix, profiles, score_matrix, score_sheets, trait_indices, weight_vector
+
+    rng = np.random.default_rng(args.seed)
+    traits = [TRAITS[i % len(TRAITS)] for i in range(args.questions)]
+    poids = {t: int(w) for t, w in zip(TRAITS, rng.integers(0, 5, len(TRAITS)))}
+    answers = rng.integers(0, 6, (args.candidates, args.questions))  # 0 = sans réponse
+    sheets = [[score or None for score in row] for row in answers.tolist()]
+
+    print(f"{args.candidates} candidats × {args.questions} questions, poids {poids}")
+    print(f"{'étape':<34} {'durée (s)':>10} {'candidats/s':>13}")
+
+    def report(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34} {elapsed:>10.3f} {args.candidates / elapsed:>13,.0f}")
+        return result
+
+    matrix = report("listes JSON -> matrice int8", lambda: answer_matrix(sheets, args.questions))
+    scores = report("profils + classement (NumPy)", lambda: score_matrix(matrix, trait_indices(traits), weight_vector(poids)))
+    report("mise en forme JSON", lambda: profiles(scores))
+    report("score_sheets (chaîne complète)", lambda: score_sheets(traits, poids, sheets))
+    legacy = report("Python pur, adéquation seule", lambda: [_tally(traits, poids, sheet) for sheet in sheets])
+
+    expected = np.array([np.nan if v is None else v for v in legacy])
+    same = np.allclose(scores["adequation"], expected, equal_nan=True, atol=1e-3)
+    print("Adéquation identique au calcul Python : " + ("oui" if same else "NON"))
+
+
+# === CACHE PARTAGÉ ENTRE WORKERS ===
+
+def _cache_worker(task):
+    """Un worker : requêtes tirées selon une loi de Zipf, appel amont simulé à chaque défaut de cache."""
+    from cache import ResponseCache, SharedCache
+
+    worker, args, shm_path = task
+    shared = None
+    if shm_path:
+        shared = SharedCache(shm_path, slots=args.l1_size * args.workers, slot_size=1024)
+    cache = ResponseCache(maxsize=args.l1_size, name="bench", shared=shared)
+    rng = random.Random(args.seed + worker)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(args.keys)]
+    keys = rng.choices(range(args.keys), weights, k=args.requests)
+
+    lookups, calls = [], 0
+    start = time.perf_counter()
+    for key in keys:
+        key = f"match:{key}"
+        t = time.perf_counter()
+        value = cache.get(key)
+        lookups.append(time.perf_counter() - t)
+        if value is None:
+            calls += 1
+            time.sleep(args.miss_cost)
+            cache.set(key, {"score": 72, "evaluation": "Profil cohérent avec le poste.",
+                            "points_forts": ["Expérience similaire"], "ecarts": []})
+    return calls, lookups, time.perf_counter() - start
+
+
+async def run_shared_cache(args):
+    import multiprocessing
+    import tempfile
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    print(f"{args.workers} workers × {args.requests} requêtes, {args.keys} clés (Zipf {args.zipf}), "
+          f"LRU local {args.l1_size}, appel amont simulé {args.miss_cost * 1000:.0f} ms")
+    print(f"{'cache':<14} {'hit rate':>9} {'appels amont':>13} {'lecture µs (moy.)':>18} {'p99 µs':>8} {'durée (s)':>10}")
+    for name, shared in (("par processus", False), ("partagé", True)):
+        shm_path = None
+        if shared:
+            shm_path = os.path.join(directory, f"bench-{os.getpid()}.cache")
+        try:
+            with multiprocessing.Pool(args.workers) as pool:
+                results = pool.map(_cache_worker, [(w, args, shm_path) for w in range(args.workers)])
+        finally:
+            if shm_path and os.path.exists(shm_path):
+                os.remove(shm_path)
+        calls = sum(r[0] for r in results)
+        lookups = sorted(x for r in results for x in r[1])
+        total = args.workers * args.requests
+        print(f"{name:<14} {1 - calls / total:>9.1%} {calls:>13} {statistics.mean(lookups) * 1e6:>18.1f} "
+              f"{lookups[int(len(lookups) * 0.99)] * 1e6:>8.1f} {max(r[2] for r in results):>10.2f}")
+
+
+# === QUASI-DOUBLONS DE CV ===
+
+def _fake_cv(rng: random.Random, vocabulary, skills):
+    lines = [" ".join(rng.choices(vocabulary, k=rng.randint(8, 16))) for _ in range(rng.randint(6, 12))]
+    lines.insert(0, f"Tél : +216 {rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}")
+    lines.append(f"{rng.randint(2005, 2020)} - {rng.randint(2021, 2025)} : " + " ".join(rng.choices(vocabulary, k=10)))
+    lines.append(", ".join(rng.sample(skills, 8)))
+    return lines
+
+
+def _edit_cv(rng: random.Random, lines):
+    """Nouvelle candidature du même CV : téléphone, dates et ordre des compétences changés."""
+    lines = list(lines)
+    lines[0] = f"Tél : +216 {rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}"
+    lines[-2] = re.sub(r"\d{4}", lambda _: str(rng.randint(2005, 2025)), lines[-2])
+    lines[-1] = ", ".join(rng.sample(lines[-1].split(", "), 8))
+    return lines
+
+
+async def run_near_dup(args):
+    from near_dup import NearDupIndex
+
+    rng = random.Random(args.seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    word = lambda: "".join(rng.choices(letters, k=rng.randint(4, 10)))
+    vocabulary = [word() for _ in range(args.vocabulary)]
+    skills = [word() for _ in range(300)]
+    index = NearDupIndex(args.threshold, args.perms, args.bands)
+    scope = lambda i: f"offre-{i % args.offres}"
+
+    print(f"{args.cvs} CV, {args.offres} offres, seuil {args.threshold}, {args.perms} permutations / {args.bands} bandes")
+    kept = []
+    start = time.perf_counter()
+    for i in range(args.cvs):
+        lines = _fake_cv(rng, vocabulary, skills)
+        if i < args.queries:
+            kept.append(lines)
+        index.add("\n".join(lines), scope(i), f"{i:064x}")
+    elapsed = time.perf_counter() - start
+    print(f"ajout : {args.cvs / elapsed:,.0f} CV/s, mémoire {index.memory() / 1e6:.1f} Mo "
+          f"({index.memory() / args.cvs:.0f} octets/CV)")
+
+    def measure(name, texts, scopes, expected):
+        signatures, lookups, right = [], [], 0
+        for i, (text, offre) in enumerate(zip(texts, scopes)):
+            t = time.perf_counter()
+            index.hasher.signature(text)
+            t1 = time.perf_counter()
+            found = index.find(text, offre)
+            t2 = time.perf_counter()
+            signatures.append(t1 - t)
+            lookups.append((t2 - t1) - (t1 - t))  # recherche seule : signature déduite
+            right += (found is not None and found[0] == f"{i:064x}") if expected else found is None
+        lookups.sort()
+        print(f"{name:<28} {right / len(texts):>8.1%} {statistics.median(signatures) * 1e6:>14.0f} "
+              f"{lookups[len(lookups) // 2] * 1e6:>10.0f} {lookups[int(len(lookups) * 0.99)] * 1e6:>10.0f}")
+
+    print(f"{'requêtes':<28} {'correct':>8} {'signature µs':>14} {'index µs':>10} {'p99 µs':>10}")
+    edited = ["\n".join(_edit_cv(rng, lines)) for lines in kept]
+    measure("CV retouchés (réutilisés)", edited, [scope(i) for i in range(len(kept))], True)
+    fresh = ["\n".join(_fake_cv(rng, vocabulary, skills)) for _ in kept]
+    measure("CV nouveaux (notés)", fresh, [scope(i) for i in range(len(kept))], False)
+    measure("CV retouchés, autre offre", edited, [scope(i + 1) for i in range(len(kept))], False)
+
+
+# === SÉRIALISATION ===
+
+def _cpu(fn, repeat: int) -> float:
+    """Temps CPU moyen d'un appel (ms)."""
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+async def run_serialization(args):
+    from typing import Any, Dict
+
+    import httpx
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    _local_state()
+    import fastjson
+    import llm
+    import main2
+    from extraction import extract_json
+    from stub_backend import StubBackend
+
+    if fastjson.orjson is None:
+        print("orjson n'est pas installé : seul le chemin de repli est mesuré.")
+    llm.set_backend(StubBackend(args.seed, latency=0))
+    rng = random.Random(args.seed)
+    test = _test(0)
+    traits = ["ouverture", "conscience", "extraversion", "agreabilite", "stabilite"] * 3
+    sheet = lambda: [rng.choice([None, 1, 2, 3, 4, 5]) for _ in traits]
+    routes = [
+        ("/match-cv-offre", _match(0)),
+        ("/generate-test", test),
+        ("/score-test", {"traits": traits, "poids": test["poids"], "reponses": sheet()}),
+        ("/score-test/batch", {"traits": traits, "poids": test["poids"], "reponses": [sheet() for _ in range(args.candidates)]}),
+        ("/match-cv-offre/batch", {"cvs": [_match(i)["cv"] for i in range(args.cvs)], "offre": MATCH_PAYLOAD["offre"], "seuil": 0}),
+    ]
+    modes = [("pydantic", False)] + ([("orjson", True)] if fastjson.orjson is not None else [])
+
+    # Temps CPU par requête de bout en bout (validation de l'entrée, route, rendu), caches chauds
+    print(f"CPU par requête (ms), {args.requests} requêtes par route, réponses en cache")
+    print(f"{'route':<24} {'octets':>10}" + "".join(f" {name:>10}" for name, _ in modes))
+    bodies = {}
+    transport = httpx.ASGITransport(app=main2.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        for path, payload in routes:
+            content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            headers = {"content-type": "application/json"}
+            response = await http.post(path, content=content, headers=headers)  # remplit les caches
+            bodies[path] = response.json()
+            row = f"{path:<24} {len(response.content):>10}"
+            for _, fast in modes:
+                fastjson.FAST_JSON = fast
+                start = time.process_time()
+                for _ in range(args.requests):
+                    await http.post(path, content=content, headers=headers)
+                row += f" {(time.process_time() - start) / args.requests * 1000:>10.3f}"
+            print(row)
+
+    # Rendu seul d'une réponse : FastAPI avec revalidation (`-> Dict[str, Any]`) ou encodeur
+    # générique (route non annotée), contre `FastJSONResponse`
+    adapter = TypeAdapter(Dict[str, Any])
+    print("\nRendu d'une réponse (ms CPU)")
+    print(f"{'route':<24} {'revalidation':>13} {'encodeur':>10}" + "".join(f" {name:>10}" for name, _ in modes))
+    for path, _ in routes:
+        body = bodies[path]
+        repeat = max(1, args.requests // (1 + len(json.dumps(body)) // 100_000))
+        row = f"{path:<24} {_cpu(lambda: adapter.dump_json(adapter.validate_python(body)), repeat):>13.3f}"
+        row += f" {_cpu(lambda: json.dumps(jsonable_encoder(body), ensure_ascii=False).encode(), repeat):>10.3f}"
+        for _, fast in modes:
+            fastjson.FAST_JSON = fast
+            row += f" {_cpu(lambda: fastjson.FastJSONResponse(body), repeat):>10.3f}"
+        print(row)
+
+    # Analyse d'une réponse du modèle (test de 15 questions, JSON indenté entre balises)
+    content = "```json\n" + json.dumps(bodies["/generate-test"]["questions"], ensure_ascii=False, indent=4) + "\n```"
+    row = f"{'extract_json (test)':<24} {'':>13} {'':>10}"
+    for _, fast in modes:
+        fastjson.FAST_JSON = fast
+        row += f" {_cpu(lambda: extract_json(content), args.requests * 10):>10.3f}"
+    print(row)
+    await llm.close_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load = sub.add_parser("load", help="Montée en concurrence de /match-cv-offre contre un amont simulé")
+    load.add_argument("--delay", type=float, default=0.2, help="Latence simulée de l'amont (s)")
+    load.add_argument("--requests", type=int, default=400)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 400])
+    load.set_defaults(func=run_load)
+
+    startup = sub.add_parser("startup", help="Démarrage et mémoire : trois processus séparés contre app.py")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(func=run_startup)
+
+    extraction = sub.add_parser("extraction", help="Récupération et coût d'analyse sur le corpus de réponses mal formées")
+    extraction.add_argument("--fuzz", type=int, default=2000, help="Nombre de réponses bruitées générées")
+    extraction.add_argument("--seed", type=int, default=0)
+    extraction.set_defaults(func=run_extraction)
+
+    tokens = sub.add_parser("tokens", help="Tokens de sortie et latence : texte libre, mode JSON, schéma strict")
+    tokens.add_argument("--calls", type=int, default=20, help="Appels par route et par mode")
+    tokens.add_argument("--live", action="store_true", help="Utilise l'amont configuré (LLM_BASE_URL, API_KEY)")
+    tokens.add_argument("--delay", type=float, default=0.05, help="Latence fixe de l'amont simulé (s)")
+    tokens.add_argument("--token-delay", type=float, default=0.002, help="Latence par token de l'amont simulé (s)")
+    tokens.set_defaults(func=run_tokens)
+
+    personality = sub.add_parser("personality", help="/analyze-personality : appels unitaires contre appels groupés")
+    personality.add_argument("--candidates", type=int, default=200)
+    personality.add_argument("--images", type=int, default=5, help="Nombre d'image_prompt distincts")
+    personality.add_argument("--concurrency", type=int, default=8)
+    personality.add_argument("--delay", type=float, default=0.3, help="Latence fixe de l'amont simulé (s)")
+    personality.add_argument("--token-delay", type=float, default=0.002, help="Latence par token de sortie (s)")
+    personality.set_defaults(func=run_personality)
+
+    endpoints = sub.add_parser("endpoints", help="Requêtes/s par route de main, main1 et main2 avec le backend local")
+    endpoints.add_argument("--versions", nargs="+", choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    endpoints.add_argument("--requests", type=int, default=200, help="Requêtes par route")
+    endpoints.add_argument("--concurrency", type=int, default=32)
+    endpoints.add_argument("--latency", type=float, default=0.0, help="Latence moyenne du backend local (s)")
+    endpoints.add_argument("--distribution", choices=["fixe", "exponentielle", "lognormale"], default="fixe")
+    endpoints.add_argument("--token-latency", type=float, default=0.0, help="Latence par token de sortie (s)")
+    endpoints.add_argument("--seed", type=int, default=0)
+    endpoints.set_defaults(func=run_endpoints)
+
+    cascade = sub.add_parser("cascade", help="Matching : gpt-4o seul contre cascade modèle rapide -> gpt-4o")
+    cascade.add_argument("--pairs", type=int, default=300)
+    cascade.add_argument("--concurrency", type=int, default=32)
+    cascade.add_argument("--band", default="40-75", help="Bande d'incertitude revue par gpt-4o")
+    cascade.add_argument("--fast-model", default="gpt-4o-mini")
+    cascade.add_argument("--fast-latency", type=float, default=0.3, help="Latence moyenne du modèle rapide (s)")
+    cascade.add_argument("--latency", type=float, default=1.0, help="Latence moyenne de gpt-4o (s)")
+    cascade.add_argument("--seed", type=int, default=0)
+    cascade.set_defaults(func=run_cascade)
+
+    scoring = sub.add_parser("scoring", help="Correction vectorisée des réponses aux tests (profils Big Five)")
+    scoring.add_argument("--candidates", type=int, default=100_000)
+    scoring.add_argument("--questions", type=int, default=15)
+    scoring.add_argument("--seed", type=int, default=0)
+    scoring.set_defaults(func=run_scoring)
+
+    shared_cache = sub.add_parser("shared-cache", help="Cache par processus contre cache partagé entre workers")
+    shared_cache.add_argument("--workers", type=int, default=4)
+    shared_cache.add_argument("--requests", type=int, default=5000, help="Requêtes par worker")
+    shared_cache.add_argument("--keys", type=int, default=5000, help="Couples (CV, offre) distincts")
+    shared_cache.add_argument("--zipf", type=float, default=1.0, help="Exposant de la loi de popularité")
+    shared_cache.add_argument("--l1-size", type=int, default=1024, help="Taille du LRU de chaque processus")
+    shared_cache.add_argument("--miss-cost", type=float, default=0.001, help="Durée simulée d'un appel amont (s)")
+    shared_cache.add_argument("--seed", type=int, default=0)
+    shared_cache.set_defaults(func=run_shared_cache)
+
+    near_dup = sub.add_parser("near-dup", help="Index MinHash/LSH des CV quasi identiques : mémoire, rappel, latence")
+    near_dup.add_argument("--cvs", type=int, default=100_000, help="CV indexés")
+    near_dup.add_argument("--offres", type=int, default=50)
+    near_dup.add_argument("--queries", type=int, default=2000)
+    near_dup.add_argument("--threshold", type=float, default=0.9)
+    near_dup.add_argument("--perms", type=int, default=128)
+    near_dup.add_argument("--bands", type=int, default=16)
+    near_dup.add_argument("--vocabulary", type=int, default=5000)
+    near_dup.add_argument("--seed", type=int, default=0)
+    near_dup.set_defaults(func=run_near_dup)
+
+    serialization = sub.add_parser("serialization", help="CPU par requête et rendu JSON : repli pydantic/json contre orjson, sans revalidation")
+    serialization.add_argument("--requests", type=int, default=200, help="Requêtes par route et par mode")
+    serialization.add_argument("--candidates", type=int, default=2000, help="Candidats de /score-test/batch")
+    serialization.add_argument("--cvs", type=int, default=200, help="CV de /match-cv-offre/batch")
+    serialization.add_argument("--seed", type=int, default=0)
+    serialization.set_defaults(func=run_serialization)
+
+    args = parser.parse_args()
+    asyncio.run(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
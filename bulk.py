@@ -0,0 +1,158 @@
+"""
+Traitement hors ligne d'un fichier JSONL (une requête par ligne).
+
+    python bulk.py match entrees.jsonl resultats.jsonl --version v2 --concurrency 16
+    python bulk.py test entrees.jsonl resultats.jsonl --version v3
+
+`match` : lignes au format `MatchingScoreRequest` de la version (cv + offre ou offre_id).
+`test`  : lignes {"offre": ..., "poids": ...} comme /generate-test.
+
+Le fichier d'entrée est lu au fil de l'eau (au plus `concurrency` lignes en cours)
+et chaque résultat est ajouté au fichier de sortie dès qu'il est prêt :
+{"ligne": n, "ok": true, "resultat": ...} ou {"ligne": n, "ok": false, "error": ...}.
+
+Le fichier de sortie sert de point de reprise : relancée avec les mêmes fichiers,
+la commande saute les lignes déjà réussies (elles ne sont pas refacturées) et
+rejoue celles en échec ; pour une ligne présente plusieurs fois, la dernière fait foi.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from batch import result_entry
+from llm import close_clients
+from scheduler import BATCH
+
+VERSIONS = {"v1": "main", "v2": "main1", "v3": "main2"}
+
+
+# === REPRISE ===
+
+def completed_lines(path: str) -> Set[int]:
+    """Lignes déjà réussies d'un fichier de sortie ; une dernière ligne tronquée (arrêt brutal) est retirée."""
+    done: Set[int] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        valid_end = 0
+        for raw in f:
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                break
+            if not raw.endswith(b"\n"):
+                break
+            valid_end += len(raw)
+            if entry.get("ok"):
+                done.add(entry["ligne"])
+        f.truncate(valid_end)
+    return done
+
+
+# === TRAITEMENTS ===
+
+def match_handler(module) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+    async def handle(payload: Dict[str, Any]) -> Dict[str, Any]:
+        data = module.MatchingScoreRequest.model_validate(payload)
+        offre, fragment, _ = module.matching.resolve(data.offre, data.offre_id)
+        return await module.matching.score(data.cv, offre, fragment, priority=BATCH)
+    return handle
+
+
+def test_handler(module) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+    from schemas import OffreInput, PoidsTraitsInput
+
+    if not hasattr(module, "questionnaire"):
+        raise SystemExit(f"La version {module.__name__} ne génère pas de tests.")
+
+    async def handle(payload: Dict[str, Any]) -> Dict[str, Any]:
+        offre = OffreInput.model_validate(payload["offre"])
+        poids = PoidsTraitsInput.model_validate(payload["poids"])
+        result = await module.questionnaire.generate(offre, poids)
+        if isinstance(result, JSONResponse):
+            return {"error": json.loads(result.body)["error"]}
+        return result
+    return handle
+
+
+async def process(
+    number: int, line: str, handle: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]], timeout: float
+) -> Tuple[int, Dict[str, Any]]:
+    try:
+        result = await asyncio.wait_for(handle(json.loads(line)), timeout)
+    except asyncio.TimeoutError:
+        result = {"error": f"Délai dépassé ({timeout:g} s)"}
+    except HTTPException as e:
+        result = {"error": e.detail}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    return number, result
+
+
+# === EXÉCUTION ===
+
+async def run(args) -> None:
+    module = importlib.import_module(VERSIONS[args.version])
+    handle = match_handler(module) if args.command == "match" else test_handler(module)
+    done = completed_lines(args.output)
+    if done:
+        print(f"Reprise : {len(done)} lignes déjà traitées", file=sys.stderr)
+
+    written = failures = 0
+    start = time.perf_counter()
+    pending: Set[asyncio.Future] = set()
+
+    with open(args.input, encoding="utf-8") as source, open(args.output, "a", encoding="utf-8") as output:
+        def write(finished) -> None:
+            nonlocal written, failures
+            for task in finished:
+                number, result = task.result()
+                entry = {"ligne": number, **result_entry(result)}
+                failures += not entry["ok"]
+                output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                written += 1
+                if written % args.progress == 0:
+                    rate = written / (time.perf_counter() - start)
+                    print(f"{written} lignes, {failures} échecs, {rate:.1f} lignes/s", file=sys.stderr)
+            output.flush()
+
+        for number, line in enumerate(source, 1):
+            if number in done or not line.strip():
+                continue
+            if len(pending) >= args.concurrency:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write(finished)
+            pending.add(asyncio.ensure_future(process(number, line, handle, args.timeout)))
+
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write(finished)
+
+    await close_clients()
+    elapsed = time.perf_counter() - start
+    print(f"Terminé : {written} lignes en {elapsed:.1f} s, {failures} échecs", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["match", "test"])
+    parser.add_argument("input", help="Fichier JSONL d'entrée")
+    parser.add_argument("output", help="Fichier JSONL de sortie (et point de reprise)")
+    parser.add_argument("--version", choices=sorted(VERSIONS), default="v2")
+    parser.add_argument("--concurrency", type=int, default=16, help="Lignes traitées simultanément")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Délai maximal par ligne (s)")
+    parser.add_argument("--progress", type=int, default=500, help="Affiche l'avancement toutes les N lignes")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
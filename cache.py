@@ -0,0 +1,321 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastjson import dumps, loads
+from metrics import CACHE_REQUESTS
+
+
+# === CLÉS ===
+
+def normalize(value: Any) -> Any:
+    """Normalise récursivement les textes (Unicode NFC, espaces compactés)."""
+    if isinstance(value, str):
+        return " ".join(unicodedata.normalize("NFC", value).split())
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def cache_key(payload: Dict[str, Any], version: str) -> str:
+    """Empreinte SHA-256 du payload normalisé et de la version du prompt/modèle."""
+    canonical = json.dumps(
+        {"v": version, "p": normalize(payload)},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# === CACHE PARTAGÉ ENTRE PROCESSUS ===
+
+_HEADER = struct.Struct("<4sIIII")  # signature, version, ensembles, voies, taille d'un emplacement
+_HEADER_SIZE = 64
+_SLOT = struct.Struct("<II16sdQ")  # séquence, longueur, empreinte de la clé, expiration, dernier accès
+_ACCESS_OFFSET = 32
+_MAGIC = b"RCSH"
+_VERSION = 1
+
+
+class SharedCache:
+    """
+    Table de hachage dans un fichier projeté en mémoire (`/dev/shm/...` de
+    préférence), partagée par tous les workers d'un hôte. Elle est associative
+    par ensembles : une clé ne peut occuper que les `ways` emplacements de son
+    ensemble, et l'éviction LRU se fait dans l'ensemble, ce qui borne la taille
+    sans index global.
+
+    Écritures : verrou par ensemble (verrou de plage `fcntl` sur un octet, plus
+    un verrou de thread). Lectures sans verrou : chaque emplacement porte un
+    compteur de séquence impair pendant une écriture ; le lecteur relit le
+    compteur après copie et ignore l'emplacement s'il a changé.
+    """
+
+    def __init__(self, path: str, slots: int = 4096, slot_size: int = 4096, ways: int = 8, ttl: float = 24 * 3600):
+        self.path = path
+        self.ways = ways
+        self.sets = max(1, slots // ways)
+        self.slot_size = slot_size
+        self.capacity = slot_size - _SLOT.size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        size = _HEADER_SIZE + self.sets * ways * slot_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, _VERSION, self.sets, ways, slot_size), 0)
+            else:
+                header = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+                if header != (_MAGIC, _VERSION, self.sets, ways, slot_size):
+                    raise ValueError(f"{path} : cache partagé d'une autre configuration {header[1:]}, à supprimer")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+
+    def _locate(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        index = int.from_bytes(digest[:8], "little") % self.sets
+        return digest, index, _HEADER_SIZE + index * self.ways * self.slot_size
+
+    def _read(self, offset: int, digest: bytes) -> Optional[bytes]:
+        """Valeur de l'emplacement si la clé correspond et n'a pas expiré (lecture sans verrou)."""
+        for _ in range(4):
+            seq, length, slot_digest, expires, _ = _SLOT.unpack_from(self._map, offset)
+            if seq & 1:
+                continue  # écriture en cours
+            if slot_digest != digest or length == 0 or expires <= time.time():
+                return None
+            data = self._map[offset + _SLOT.size:offset + _SLOT.size + length]
+            if struct.unpack_from("<I", self._map, offset)[0] == seq:
+                return data
+        return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        digest, _, base = self._locate(key)
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            data = self._read(offset, digest)
+            if data is not None:
+                # LRU approché : horodatage écrit sans verrou (une course ne fait que rajeunir l'entrée)
+                struct.pack_into("<Q", self._map, offset + _ACCESS_OFFSET, time.monotonic_ns())
+                self.hits += 1
+                return loads(data)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        data = dumps(value)
+        if len(data) > self.capacity:
+            self.oversized += 1
+            return
+        digest, index, base = self._locate(key)
+        with self._thread_locks[index % len(self._thread_locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, index)
+            try:
+                offset = self._victim(base, digest)
+                seq = struct.unpack_from("<I", self._map, offset)[0] | 1
+                struct.pack_into("<I", self._map, offset, seq)
+                self._map[offset + _SLOT.size:offset + _SLOT.size + len(data)] = data
+                _SLOT.pack_into(
+                    self._map, offset, seq, len(data), digest, time.time() + self.ttl, time.monotonic_ns()
+                )
+                struct.pack_into("<I", self._map, offset, (seq + 1) & 0xFFFFFFFF)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, index)
+
+    def _victim(self, base: int, digest: bytes) -> int:
+        """Emplacement à écrire : même clé, sinon libre ou expiré, sinon le moins récemment lu."""
+        now = time.time()
+        free, oldest, oldest_access = None, base, None
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            _, length, slot_digest, expires, access = _SLOT.unpack_from(self._map, offset)
+            if slot_digest == digest and length:
+                return offset
+            if free is None and (length == 0 or expires <= now):
+                free = offset
+            if oldest_access is None or access < oldest_access:
+                oldest, oldest_access = offset, access
+        if free is not None:
+            return free
+        self.evictions += 1
+        return oldest
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for slot in range(self.sets * self.ways):
+            _, length, _, expires, _ = _SLOT.unpack_from(self._map, _HEADER_SIZE + slot * self.slot_size)
+            count += length > 0 and expires > now
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de ce processus ; `entrees` est commun à tous les workers."""
+        return {
+            "fichier": self.path,
+            "entrees": len(self),
+            "emplacements": self.sets * self.ways,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "trop_gros": self.oversized,
+        }
+
+
+# === CACHE ===
+
+class ResponseCache:
+    """
+    Cache à plusieurs niveaux pour les réponses du modèle :
+    - LRU en mémoire avec TTL et taille maximale,
+    - cache partagé optionnel entre les workers de l'hôte (`SharedCache`),
+    - table SQLite optionnelle qui survit aux redémarrages.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 24 * 3600,
+        path: Optional[str] = None,
+        name: str = "reponses",
+        shared: Optional[SharedCache] = None,
+    ):
+        self.name = name
+        self.shared = shared
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value TEXT)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.inc((self.name, "hit"))
+                    return value
+                del self._entries[key]
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, value, now)
+                CACHE_REQUESTS.inc((self.name, "shared_hit"))
+                return value
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc((self.name, "miss"))
+                return None
+            self.disk_hits += 1
+            CACHE_REQUESTS.inc((self.name, "disk_hit"))
+            self._store(key, value, now)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        if self.shared is not None:
+            self.shared.set(key, value)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, dumps(value).decode("utf-8")),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.disk_hits + self.misses
+        stats = {
+            "entrees": len(self._entries),
+            "taille_max": self.maxsize,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.shared_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+        if self.shared is not None:
+            stats["partage"] = self.shared.stats()
+        return stats
+
+    def _store(self, key: str, value: Dict[str, Any], now: float) -> None:
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT expires, value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] <= time.time():
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        return loads(row[1])
+
+
+def cache_from_env(prefix: str) -> ResponseCache:
+    """
+    Construit un cache depuis `<PREFIX>_CACHE_SIZE`, `_CACHE_TTL`, `_CACHE_PATH` et,
+    pour le partage entre workers, `_CACHE_SHM` (fichier, ex. /dev/shm/match.cache),
+    `_CACHE_SHM_SLOTS` et `_CACHE_SHM_SLOT_SIZE` (octets par entrée).
+    """
+    ttl = float(os.getenv(f"{prefix}_CACHE_TTL", str(24 * 3600)))
+    shared = None
+    if os.getenv(f"{prefix}_CACHE_SHM"):
+        shared = SharedCache(
+            os.getenv(f"{prefix}_CACHE_SHM"),
+            slots=int(os.getenv(f"{prefix}_CACHE_SHM_SLOTS", "4096")),
+            slot_size=int(os.getenv(f"{prefix}_CACHE_SHM_SLOT_SIZE", "4096")),
+            ttl=ttl,
+        )
+    return ResponseCache(
+        maxsize=int(os.getenv(f"{prefix}_CACHE_SIZE", "1024")),
+        ttl=ttl,
+        path=os.getenv(f"{prefix}_CACHE_PATH") or None,
+        name=prefix.lower(),
+        shared=shared,
+    )
@@ -0,0 +1,265 @@
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import cache_from_env
+from metrics import CV_TOKENS
+from prompts import count_tokens
+
+# Budget de tokens du CV pour le matching (0 : pas de coupe, nettoyage seul) ; le prompt
+# d'image ne contient pas le CV, cette route n'est pas compactée
+CV_TOKEN_BUDGET_MATCH = int(os.getenv("CV_TOKEN_BUDGET_MATCH", "1500"))
+
+COMPACTION_VERSION = "4"
+
+# Rubriques reconnues (titres FR/EN) et priorité : 1 gardée en premier ; None : gardée
+# seulement si tout le CV tient dans le budget
+SECTIONS: List[Tuple[str, Optional[int], re.Pattern]] = [
+    (name, priority, re.compile(rf"(?:{pattern})s?", re.IGNORECASE))
+    for name, priority, pattern in [
+        ("experience", 1, r"exp[ée]riences?( professionnelles?)?|parcours( professionnel)?|work experience|experience"
+                          r"|employment( history)?|work history|professional experience|career( history)?"
+                          r"|historique professionnel|emplois?|postes? occup[ée]s"),
+        ("stages", 1, r"stages?|internships?|alternances?|apprentissages?"),
+        ("competences", 1, r"comp[ée]tences?( techniques| cl[ée]s| informatiques)?|skills?|technical skills"
+                           r"|hard skills|soft skills|savoir[- ]faire|savoir[- ][êe]tre|outils|technologies|informatique"),
+        ("formation", 1, r"formations?|[ée]ducation|dipl[ôo]mes?|cursus|[ée]tudes|academic background"
+                         r"|qualifications?"),
+        ("profil", 2, r"profil|r[ée]sum[ée]|summary|objectif|[àa] propos|about me"),
+        ("certifications", 2, r"certifications?|certificats?|habilitations?"),
+        ("projets", 2, r"projets?|projects?|r[ée]alisations?"),
+        ("publications", 2, r"publications?|travaux de recherche"),
+        ("benevolat", 3, r"b[ée]n[ée]volat|volunteering|volunteer experience|vie associative"
+                         r"|engagements?( associatifs?)?"),
+        ("distinctions", 3, r"distinctions?|prix|awards?|honou?rs"),
+        ("langues", 3, r"langues?|languages?"),
+        ("interets", None, r"centres? d'int[ée]r[êe]ts?|loisirs|hobbies|interests|activit[ée]s extra"),
+        ("references", None, r"r[ée]f[ée]rences?"),
+        ("contact", None, r"contact|coordonn[ée]es|informations? personnelles?|[ée]tat civil"),
+    ]
+]
+_ORDER = [
+    "entete", "profil", "experience", "stages", "competences", "formation", "certifications", "projets",
+    "publications", "benevolat", "distinctions", "langues", "interets", "references", "contact",
+]
+_TITLES = {
+    "profil": "Profil", "experience": "Expérience", "stages": "Stages", "competences": "Compétences",
+    "formation": "Formation", "certifications": "Certifications", "projets": "Projets",
+    "publications": "Publications", "benevolat": "Bénévolat", "distinctions": "Distinctions",
+    "langues": "Langues", "interets": "Centres d'intérêt", "references": "Références", "contact": "Contact",
+}
+_HEADER_PRIORITY = 1
+_OTHER_PRIORITY = 2  # rubrique au titre non reconnu
+
+# Lignes sans valeur pour le matching : pagination, mentions de gabarit
+_BOILERPLATE = re.compile(r"^page \d+( ?(/|sur|of) ?\d+)?$|^(curriculum vit(ae|æ)|cv)$", re.IGNORECASE)
+# État civil : retiré de l'en-tête seulement, comme les coordonnées
+_PERSONAL = re.compile(r"^(né|née|date de naissance|âge|situation familiale|adresse)\b", re.IGNORECASE)
+# Permis, nationalité, autorisation de travail : parfois exigés par l'offre, toujours gardés
+# (ramenés dans l'en-tête quand ils figurent dans une rubrique retirable)
+_REQUIREMENT = re.compile(
+    r"^(permis|nationalit[ée]|autorisation de travail|titre de s[ée]jour|work (permit|authori[sz]ation)|visa"
+    r"|driving licen[cs]e|driver'?s licen[cs]e)\b",
+    re.IGNORECASE,
+)
+# Coordonnées : la ligne entière est retirée dans l'en-tête, seule la mention ailleurs
+_CONTACT = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"                      # e-mail
+    r"|(?:https?://|www\.)\S+|(?:linkedin|github)\.com\S*",
+    re.IGNORECASE,
+)
+# Téléphone : 8 chiffres ou plus par groupes (« +216 22 333 444 », « 06.12.34.56.78 »)
+_PHONE = re.compile(r"(?<![\w-])\+?\(?\d{1,4}\)?(?:[ .]?\d{2,4}){3,5}(?![\w-])")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_BULLETS = re.compile(r"^[-•·▪●◦*–]+\s*")
+_KEY = re.compile(r"[^\w]+")
+# Petits mots admis en minuscules dans un titre (« Centres d'intérêt », « Work and Travel »)
+_TITLE_WORDS = frozenset("à au aux d de des du en et l la le les of and the in for".split())
+
+
+# === NETTOYAGE ===
+
+def _lines(text: str) -> List[str]:
+    """Lignes normalisées (NFC, espaces compactés, puces retirées), sans lignes vides."""
+    text = unicodedata.normalize("NFC", text).replace("\r", "\n")
+    lines = (_BULLETS.sub("", _SPACES.sub(" ", line).strip()) for line in text.split("\n"))
+    return [line for line in lines if line]
+
+
+def _is_phone(line: str) -> bool:
+    match = _PHONE.search(line)
+    return match is not None and sum(c.isdigit() for c in match.group()) >= 8
+
+
+def strip_phones(text: str) -> str:
+    """Texte sans ses numéros de téléphone (les autres nombres sont gardés)."""
+    return _PHONE.sub(lambda m: " " if sum(c.isdigit() for c in m.group()) >= 8 else m.group(), text)
+
+
+def _strip_contact(line: str) -> str:
+    """
+    Ligne sans e-mail, URL ni téléphone ; vide s'il ne reste qu'une étiquette
+    (« Contact : jd@x.fr », « GitHub : ... ») ou de la ponctuation.
+    """
+    if not (_CONTACT.search(line) or _is_phone(line)):
+        return line
+    stripped = _SPACES.sub(" ", _CONTACT.sub(" ", strip_phones(line))).strip(" ,;:-–|")
+    return stripped if len(_KEY.sub(" ", stripped).split()) > 1 else ""
+
+
+def _heading(line: str) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Rubrique annoncée par une ligne de titre, sinon None : le titre seul
+    (« Compétences »), ou suivi de quelques mots s'il est en capitales ou se
+    termine par deux-points (« FORMATION ACADÉMIQUE », « Expérience en France : »).
+    """
+    if len(line) > 60:
+        return None
+    title = line.rstrip(" :").strip()
+    loose = (line.isupper() or line.endswith(":")) and len(title.split()) <= 5
+    for name, priority, pattern in SECTIONS:
+        if pattern.fullmatch(title) or (loose and pattern.match(title)):
+            return name, priority
+    return None
+
+
+def _looks_like_heading(line: str) -> bool:
+    """
+    Ligne qui a la forme d'un titre de rubrique, connu ou non : courte, sans chiffres
+    ni ponctuation de phrase, en capitales, terminée par deux-points ou dont chaque
+    mot (hors petits mots) commence par une majuscule.
+    """
+    title = line.rstrip(" :").strip()
+    words = title.replace("'", " ").replace("’", " ").split()
+    if not words or len(words) > 4 or len(title) > 40 or any(c.isdigit() or c in ",;.!?()@/" for c in title):
+        return False
+    return line.isupper() or line.endswith(":") or all(w[0].isupper() or w.lower() in _TITLE_WORDS for w in words)
+
+
+def sections(text: str) -> Dict[str, Tuple[Optional[int], List[str]]]:
+    """
+    Rubriques du CV, dans l'ordre du texte : {nom: (priorité, lignes)}. Une rubrique
+    de priorité None s'arrête au premier titre, même inconnu : celui-ci ouvre une
+    rubrique nommée d'après lui (« Missions freelance »). Les rubriques répétées
+    (en-têtes de page d'un PDF) sont fusionnées, les lignes en double et les
+    mentions sans valeur retirées, de même que l'en-tête répété hors de sa place
+    (ligne de trois mots ou plus, tous déjà présents dans l'en-tête). Les lignes de
+    coordonnées et d'état civil de l'en-tête disparaissent ; ailleurs, seuls e-mails,
+    URL et téléphones sont ôtés de la ligne. Permis, nationalité ou autorisation de
+    travail notés dans une rubrique retirable passent dans l'en-tête.
+    """
+    found: Dict[str, Tuple[Optional[int], List[str]]] = {"entete": (_HEADER_PRIORITY, [])}
+    current = "entete"
+    seen = set()
+    header_words = set()
+    for line in _lines(text):
+        heading = _heading(line)
+        if heading is None and found[current][0] is None and _looks_like_heading(line) and not _REQUIREMENT.match(line):
+            heading = line.rstrip(" :").strip(), _OTHER_PRIORITY
+        if heading is not None:
+            current = heading[0]
+            found.setdefault(current, (heading[1], []))
+            continue
+        if _BOILERPLATE.search(line):
+            continue
+        section = current
+        if found[current][0] is None and _REQUIREMENT.match(line):
+            section = "entete"
+        if section == "entete":
+            if _CONTACT.search(line) or _is_phone(line) or _PERSONAL.match(line):
+                continue
+        else:
+            line = _strip_contact(line)
+        key = _KEY.sub(" ", line.lower()).strip()
+        if not key or key in seen:
+            continue
+        words = key.split()
+        if section == "entete":
+            header_words.update(words)
+        elif len(words) >= 3 and header_words.issuperset(words):
+            continue
+        seen.add(key)
+        found[section][1].append(line)
+    return found
+
+
+def _fill(found: Dict[str, Tuple[Optional[int], List[str]]], budget: int) -> Tuple[Dict[str, List[str]], bool]:
+    """
+    Lignes gardées par rubrique, les plus prioritaires servies d'abord, chacune ligne
+    par ligne (les plus récentes, en tête, d'abord) ; et si tout a tenu dans le budget.
+    """
+    kept: Dict[str, List[str]] = {}
+    used = 0
+    complete = True
+    ranked = sorted(
+        ((name, priority, lines) for name, (priority, lines) in found.items() if lines),
+        key=lambda section: section[1] if section[1] is not None else float("inf"),
+    )
+    for name, _, lines in ranked:
+        title_tokens = count_tokens(_TITLES.get(name, name)) + 2
+        for line in lines:
+            cost = count_tokens(line) + 1 + (title_tokens if name not in kept else 0)
+            if budget and used + cost > budget:
+                complete = False
+                break
+            kept.setdefault(name, []).append(line)
+            used += cost
+    return kept, complete
+
+
+def compact(text: str, budget: int) -> str:
+    """
+    CV nettoyé et tenu sous `budget` tokens. S'il ne tient pas en entier, les rubriques
+    de priorité None (contact, loisirs, références) sont retirées et les autres servies
+    par priorité. Le texte est réassemblé dans un ordre fixe, les rubriques aux titres
+    non reconnus à la suite, dans l'ordre du CV.
+    """
+    found = sections(text)
+    kept, complete = _fill(found, budget)
+    if not complete:
+        kept, _ = _fill({name: section for name, section in found.items() if section[0] is not None}, budget)
+    parts = []
+    for name in _ORDER + [name for name in found if name not in _ORDER]:
+        if name in kept:
+            title = "" if name == "entete" else f"{_TITLES.get(name, name)} :\n"
+            parts.append(title + "\n".join(kept[name]))
+    return "\n\n".join(parts)
+
+
+# === CACHE ===
+
+class CVCompactor:
+    """Compaction des CV, mise en cache par empreinte du texte brut et budget."""
+
+    def __init__(self):
+        self.cache = cache_from_env("CV")
+
+    def __call__(self, cv: str, budget: int, route: str) -> Tuple[str, Dict[str, int]]:
+        """(CV compacté, rapport {tokens_avant, tokens_apres, tokens_economises})."""
+        digest = hashlib.sha256(cv.encode("utf-8")).hexdigest()
+        key = f"{COMPACTION_VERSION}:{budget}:{digest}"
+        entry = self.cache.get(key)
+        if entry is None:
+            text = compact(cv, budget)
+            original = " ".join(cv.split())
+            # Rien de reconnu, ou CV court qu'ajouter les titres de rubrique allongerait :
+            # le texte d'origine, espaces compactés
+            if not text.strip() or count_tokens(original) <= count_tokens(text):
+                text = original
+            entry = {"cv": text, "tokens_avant": count_tokens(cv), "tokens_apres": count_tokens(text)}
+            self.cache.set(key, entry)
+        CV_TOKENS.inc((route, "avant"), entry["tokens_avant"])
+        CV_TOKENS.inc((route, "apres"), entry["tokens_apres"])
+        return entry["cv"], {
+            "tokens_avant": entry["tokens_avant"],
+            "tokens_apres": entry["tokens_apres"],
+            "tokens_economises": entry["tokens_avant"] - entry["tokens_apres"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+compact_cv = CVCompactor()
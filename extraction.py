@@ -0,0 +1,182 @@
+import json
+import re
+from typing import Any, List, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from fastjson import loads
+
+M = TypeVar("M", bound=BaseModel)
+
+# Caractères qui changent l'état de l'analyse ; tout le reste est sauté d'un bloc
+_STRUCTURAL = re.compile(r'[\[\]{}"\\]')
+_ELEMENT = re.compile(r"[\[{\]]")
+
+
+# === TABLEAU JSON INCRÉMENTAL ===
+
+class JsonArrayStream:
+    """
+    Analyseur incrémental d'un tableau JSON reçu par morceaux (flux de tokens).
+
+    `feed()` renvoie les éléments de premier niveau dès que leur accolade ou crochet
+    fermant arrive. Le texte qui précède le tableau (balises ```json, prose) est ignoré.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        items = []
+        pos, end = 0, len(chunk)
+        while pos < end and not self._finished:
+            if not self._started:
+                pos = chunk.find("[", pos)
+                if pos == -1:
+                    break
+                self._started = True
+                pos += 1
+                continue
+
+            if self._depth == 0:
+                match = _ELEMENT.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == "]":
+                    self._finished = True
+                else:
+                    self._depth = 1
+                    self._buffer = [match.group()]
+                continue
+
+            # Dans un élément : on saute d'un caractère structurant au suivant
+            start = pos
+            while True:
+                if self._escape:
+                    if pos >= end:
+                        break
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRUCTURAL.search(chunk, pos)
+                if match is None:
+                    pos = end
+                    break
+                char, pos = match.group(), match.end()
+                if self._in_string:
+                    if char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        break
+            self._buffer.append(chunk[start:pos])
+            if self._depth == 0:
+                try:
+                    items.append(loads("".join(self._buffer)))
+                except json.JSONDecodeError:
+                    pass
+                self._buffer = []
+        return items
+
+
+# === EXTRACTION TOLÉRANTE ===
+
+def _balanced_end(text: str, start: int) -> int:
+    """Index juste après la valeur JSON ouverte en `start` ({ ou [), ou -1 si elle n'est pas refermée."""
+    depth = 0
+    in_string = False
+    pos = start
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return -1
+        char, pos = match.group(), match.end()
+        if in_string:
+            if char == "\\":
+                pos += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def _truncated(text: str, start: int) -> bool:
+    """
+    La valeur non refermée ouverte en `start` est-elle du JSON coupé en fin de réponse ?
+    Sinon c'est un crochet de prose (« Note [1 : ... ») : le décodeur échoue avant la fin.
+    """
+    fragment = text[start:].rstrip().removesuffix("```").rstrip()
+    try:
+        json.loads(fragment)
+    except json.JSONDecodeError as e:
+        return e.pos >= len(fragment) or e.msg.startswith("Unterminated string")
+    return False
+
+
+def extract_json(text: str) -> Any:
+    """
+    Première valeur JSON équilibrée (objet ou tableau) du texte, quel que soit ce qui
+    l'entoure (balises ```json, prose). Lève `ValueError` si aucune n'est décodable,
+    « tronquée » si la réponse s'arrête au milieu d'une valeur.
+    """
+    start = 0
+    while True:
+        candidates = [i for i in (text.find("{", start), text.find("[", start)) if i != -1]
+        if not candidates:
+            raise ValueError("Aucune valeur JSON complète dans la réponse.")
+        start = min(candidates)
+        end = _balanced_end(text, start)
+        if end == -1:
+            if _truncated(text, start):
+                raise ValueError("Valeur JSON tronquée.")
+            start += 1  # crochet ouvert dans la prose : candidat suivant
+            continue
+        try:
+            return loads(text[start:end])
+        except json.JSONDecodeError:
+            start += 1
+
+
+def extract_array(text: str) -> Tuple[List[Any], bool]:
+    """
+    Éléments complets du premier tableau JSON du texte, même tronqué : renvoie les
+    éléments récupérés et si le tableau était refermé.
+    """
+    parser = JsonArrayStream()
+    items = parser.feed(text)
+    return items, parser.finished
+
+
+def validate_items(items: List[Any], model: Type[M]) -> Tuple[List[M], List[Any]]:
+    """Sépare les éléments conformes au modèle Pydantic des autres."""
+    valid: List[M] = []
+    invalid: List[Any] = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError:
+            invalid.append(item)
+    return valid, invalid
@@ -0,0 +1,42 @@
+import json
+import os
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Chemin rapide (orjson) pour analyser les réponses du modèle et rendre les réponses
+# des routes ; FAST_JSON=0 (ou orjson absent) : `json` pour l'analyse, le sérialiseur
+# de pydantic pour le rendu. Les clés de cache restent calculées avec `json`
+# (cache.cache_key) : elles ne dépendent pas de ce choix.
+FAST_JSON = orjson is not None and os.getenv("FAST_JSON", "1") != "0"
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Comme `json.loads` ; les erreurs restent des `json.JSONDecodeError` (orjson en hérite)."""
+    if FAST_JSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """JSON compact en UTF-8, accents non échappés, NaN rendu en null."""
+    if FAST_JSON:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(value, inf_nan_mode="null")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse rendue par `dumps`. Une route qui la renvoie elle-même échappe aussi à la
+    revalidation de FastAPI contre son `response_model` (documenté dans l'OpenAPI) :
+    à réserver aux résultats déjà validés ou construits par le service.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
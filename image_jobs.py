@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from cache import cache_key
+from image_store import ImageStore
+from llm import generate_image
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+IMAGE_JOB_TTL = float(os.getenv("IMAGE_JOB_TTL", "3600"))  # conservation des tâches terminées (s)
+IMAGE_JOB_POLL = float(os.getenv("IMAGE_JOB_POLL", "0.5"))  # relecture d'une tâche d'un autre worker (s)
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class ImageJob:
+    job_id: str
+    key: str
+    prompt: str
+    statut: str = "en_attente"  # en_attente, en_cours, termine, echec
+    image: Optional[str] = None
+    erreur: Optional[str] = None
+    cree: float = field(default_factory=time.time)
+    termine: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def finish(self, image: Optional[str] = None, erreur: Optional[str] = None) -> None:
+        self.image = image
+        self.erreur = erreur
+        self.statut = "termine" if image is not None else "echec"
+        self.termine = time.time()
+        self.done.set()
+
+    def record(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "done"}
+
+
+class ImageJobs:
+    """
+    Génération d'images en tâche de fond : `submit()` rend la main tout de suite,
+    un pool de `workers` tâches appelle DALL·E puis télécharge l'image dans le
+    magasin local. Un prompt déjà servi est terminé sans appel ; deux demandes
+    identiques en cours partagent la même tâche.
+
+    L'état de chaque tâche est aussi écrit dans `jobs/<job_id>.json` à côté des
+    images : un autre worker derrière le même répartiteur sait répondre à
+    /image-jobs/{job_id} et suivre la tâche jusqu'à sa fin. Seuls la file et les
+    compteurs de `stats()` restent propres au processus.
+    """
+
+    def __init__(self, store: ImageStore, workers: int = IMAGE_WORKERS, size: str = "1024x1024"):
+        self.store = store
+        self.workers = workers
+        self.size = size
+        self._directory = os.path.join(store.directory, "jobs")
+        os.makedirs(self._directory, exist_ok=True)
+        self._jobs: Dict[str, ImageJob] = {}
+        self._pending: Dict[str, ImageJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.generated = 0
+        self.reused = 0
+        self._sweep()
+
+    def submit(self, prompt: str, variant: int = 0) -> ImageJob:
+        """`variant` distingue plusieurs images voulues pour un même prompt."""
+        self._prune()
+        key = cache_key({"prompt": prompt, "size": self.size, "variante": variant}, "dall-e-3")
+        if key in self._pending:
+            return self._pending[key]
+
+        job = ImageJob(uuid.uuid4().hex, key, prompt)
+        self._jobs[job.job_id] = job
+        stored = self.store.lookup(key)
+        if stored is not None:
+            self.reused += 1
+            job.finish(image=stored)
+            self._save(job)
+            return job
+
+        self._start()
+        self._pending[key] = job
+        self._save(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImageJob]:
+        """Tâche de ce processus, sinon état écrit sur disque par un autre worker."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        job = self._load(job_id)
+        return job if job is not None and not self._expired(job, time.time() - IMAGE_JOB_TTL) else None
+
+    async def wait(self, job: ImageJob, timeout: float) -> ImageJob:
+        """
+        Attend la fin de la tâche au plus `timeout` secondes (attente longue côté client)
+        et renvoie son dernier état ; celle d'un autre worker est relue toutes les
+        `IMAGE_JOB_POLL` secondes.
+        """
+        if timeout <= 0 or job.done.is_set():
+            return job
+        if job.job_id in self._jobs:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return job
+        deadline = time.monotonic() + timeout
+        while not job.done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(min(IMAGE_JOB_POLL, deadline - time.monotonic()))
+            job = self._load(job.job_id) or job
+        return job
+
+    # === ÉTAT SUR DISQUE ===
+
+    def _file(self, job_id: str) -> str:
+        return os.path.join(self._directory, f"{job_id}.json")
+
+    def _save(self, job: ImageJob) -> None:
+        path = self._file(job.job_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.record(), f)
+        os.replace(tmp, path)
+
+    def _load(self, job_id: str) -> Optional[ImageJob]:
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        try:
+            with open(self._file(job_id), encoding="utf-8") as f:
+                job = ImageJob(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if job.statut in ("termine", "echec"):
+            job.done.set()
+        return job
+
+    def _expired(self, job: ImageJob, limit: float) -> bool:
+        # Une tâche jamais terminée (worker arrêté) expire à partir de sa création
+        return (job.termine if job.termine is not None else job.cree) < limit
+
+    def _sweep(self) -> None:
+        """Supprime les états expirés laissés sur disque, y compris par d'autres workers."""
+        limit = time.time() - IMAGE_JOB_TTL
+        for name in os.listdir(self._directory):
+            job = self._load(name[:-5]) if name.endswith(".json") else None
+            if job is not None and self._expired(job, limit):
+                try:
+                    os.remove(self._file(job.job_id))
+                except FileNotFoundError:
+                    pass
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.ensure_future(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.statut = "en_cours"
+            self._save(job)
+            try:
+                url = await generate_image(job.prompt, self.size)
+                name = await self.store.fetch(url)
+                self.store.remember(job.key, name)
+                self.generated += 1
+                job.finish(image=name)
+            except Exception as e:
+                job.finish(erreur=f"Erreur lors de la génération de l'image : {str(e)}")
+            finally:
+                self._save(job)
+                self._pending.pop(job.key, None)
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        limit = time.time() - IMAGE_JOB_TTL
+        for job_id in [j.job_id for j in self._jobs.values() if j.termine is not None and j.termine < limit]:
+            del self._jobs[job_id]
+            try:
+                os.remove(self._file(job_id))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        statuts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuts[job.statut] = statuts.get(job.statut, 0) + 1
+        return {
+            "taches": statuts,
+            "file": self._queue.qsize() if self._queue is not None else 0,
+            "workers": len([t for t in self._tasks if not t.done()]),
+            "images_stockees": len(self.store),
+            "generees": self.generated,
+            "reutilisees": self.reused,
+        }
+
+
+def image_jobs_router(
+    jobs: ImageJobs,
+    request_model: Type[BaseModel],
+    build_prompt: Callable[[Any], str],
+) -> APIRouter:
+    """Routes /generate-image-question/jobs, /image-jobs/* et /images/* d'une version."""
+    router = APIRouter()
+
+    def describe(job: ImageJob, request: Request) -> Dict[str, Any]:
+        body = {
+            "job_id": job.job_id,
+            "statut": job.statut,
+            "url_statut": str(request.url_for("image_job_status", job_id=job.job_id)),
+            "description_auto": job.prompt,
+        }
+        if job.image is not None:
+            body["image_url"] = str(request.url_for("stored_image", name=job.image))
+        if job.erreur is not None:
+            body["error"] = job.erreur
+        return body
+
+    @router.post("/generate-image-question/jobs", status_code=202)
+    async def submit_image_job(data: request_model, request: Request) -> Dict[str, Any]:
+        """Planifie la génération et renvoie aussitôt l'identifiant de la tâche."""
+        return describe(jobs.submit(build_prompt(data)), request)
+
+    @router.get("/image-jobs/{job_id}", name="image_job_status")
+    async def image_job_status(job_id: str, request: Request, attente: float = 0.0) -> Dict[str, Any]:
+        """État d'une tâche ; `attente` (s, max 60) garde la requête ouverte jusqu'à la fin."""
+        job = jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Tâche inconnue : {job_id}")
+        job = await jobs.wait(job, min(attente, 60.0))
+        return describe(job, request)
+
+    @router.get("/image-jobs")
+    async def image_jobs_stats() -> Dict[str, Any]:
+        return jobs.stats()
+
+    @router.get("/images/{name}", name="stored_image")
+    async def stored_image(name: str) -> FileResponse:
+        path = jobs.store.path(name)
+        if path is None:
+            raise HTTPException(status_code=404, detail=f"Image inconnue : {name}")
+        # Nom = empreinte du contenu : le fichier ne change jamais
+        return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+    return router
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional
+
+from llm import get_http_client
+
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", ".images")
+
+_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp)$")
+
+
+class ImageStore:
+    """
+    Images stockées par contenu : chaque fichier s'appelle `<sha256>.<ext>` et n'est
+    écrit qu'une fois. `prompts.jsonl` associe la clé d'un prompt à son image, pour
+    ne jamais régénérer une image déjà téléchargée.
+    """
+
+    def __init__(self, directory: str = IMAGE_STORE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._prompts_path = os.path.join(directory, "prompts.jsonl")
+        self._prompts: Dict[str, str] = {}
+
+        if os.path.exists(self._prompts_path):
+            with open(self._prompts_path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._prompts[entry["cle"]] = entry["image"]
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def put(self, data: bytes, ext: str = "png") -> str:
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return name
+
+    def path(self, name: str) -> Optional[str]:
+        """Chemin du fichier `name`, ou None si le nom est invalide ou inconnu."""
+        if not _NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+    def delete(self, name: str) -> None:
+        path = self.path(name)
+        if path is not None:
+            os.remove(path)
+
+    def lookup(self, key: str) -> Optional[str]:
+        name = self._prompts.get(key)
+        return name if name is not None and self.path(name) else None
+
+    def remember(self, key: str, name: str) -> None:
+        if self._prompts.get(key) == name:
+            return
+        with open(self._prompts_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"cle": key, "image": name}) + "\n")
+        self._prompts[key] = name
+
+    async def fetch(self, url: str) -> str:
+        """Télécharge une image (URL fournisseur, temporaire, ou URL data:) et la range dans le magasin."""
+        if url.startswith("data:"):
+            header, _, payload = url.partition(",")
+            content_type = header[5:].split(";")[0]
+            return self.put(base64.b64decode(payload), _EXTENSIONS.get(content_type, "png"))
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        return self.put(response.content, _EXTENSIONS.get(content_type, "png"))
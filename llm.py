@@ -0,0 +1,283 @@
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from metrics import TOKENS, operation
+from scheduler import INTERACTIVE, scheduler_from_env
+
+try:
+    import h2  # noqa: F401  (active HTTP/2 dans httpx)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# === CONFIGURATION ===
+
+load_dotenv()
+
+# Backend des appels au modèle : "openai" (Azure/OpenAI) ou "stub" (local, sans réseau)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://models.inference.ai.azure.com")
+IMAGES_BASE_URL = os.getenv("IMAGES_BASE_URL")  # None = API OpenAI par défaut
+
+# Sortie structurée : "json_schema" (schéma strict), "json_object" (mode JSON) ou "off"
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "json_schema")
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "512"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "128"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# Prix publics (USD par million de tokens : entrée, sortie), pour les rapports de coût
+MODEL_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+}
+
+Prompt = Union[str, List[Dict[str, str]]]
+
+# Budgets amont : sans limite tant que LLM_RPM / LLM_TPM / IMAGES_RPM ... ne donnent pas
+# les quotas du compte ; les nouvelles tentatives sont gérées par l'ordonnanceur, pas par le SDK
+chat_scheduler = scheduler_from_env("LLM")
+images_scheduler = scheduler_from_env("IMAGES")
+
+_http_client: Optional[httpx.AsyncClient] = None
+_chat_client: Optional[AsyncOpenAI] = None
+_images_client: Optional[AsyncOpenAI] = None
+_backend: Optional[Any] = None
+
+
+# === CLIENTS PARTAGÉS ===
+
+def get_http_client() -> httpx.AsyncClient:
+    """Pool de connexions HTTP unique (keep-alive, HTTP/2 si `h2` est installé) pour tous les appels amont."""
+    global _http_client
+    if _http_client is None:
+        _http_client = DefaultAsyncHttpxClient(
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+def get_chat_client() -> AsyncOpenAI:
+    """Client asynchrone partagé vers le déploiement gpt-4o (créé au premier appel)."""
+    global _chat_client
+    if _chat_client is None:
+        _chat_client = AsyncOpenAI(
+            base_url=LLM_BASE_URL,
+            api_key=os.getenv("API_KEY"),
+            http_client=get_http_client(),
+            max_retries=0,
+        )
+    return _chat_client
+
+
+def get_images_client() -> AsyncOpenAI:
+    """Client asynchrone partagé vers l'API d'images (DALL·E)."""
+    global _images_client
+    if _images_client is None:
+        _images_client = AsyncOpenAI(
+            base_url=IMAGES_BASE_URL,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=get_http_client(),
+            max_retries=0,
+        )
+    return _images_client
+
+
+async def close_clients() -> None:
+    global _http_client, _chat_client, _images_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = _chat_client = _images_client = None
+
+
+# === BACKENDS ===
+
+class OpenAIBackend:
+    """
+    Appels réels via les clients partagés. Tout backend expose la même interface :
+    `chat` -> (texte, usage), `stream` -> itérateur de (morceau, usage ou None),
+    `image` -> URL de l'image.
+    """
+
+    name = "openai"
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int, **kwargs) -> Tuple[str, Any]:
+        response = await get_chat_client().chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, **kwargs
+        )
+        return response.choices[0].message.content, response.usage
+
+    async def stream(
+        self, messages: List[Dict[str, str]], model: str, max_tokens: int, **kwargs
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        stream = await get_chat_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs,
+        )
+
+        async def chunks():
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                yield text or "", getattr(chunk, "usage", None)
+
+        return chunks()
+
+    async def image(self, prompt: str, size: str) -> str:
+        response = await get_images_client().images.generate(
+            model="dall-e-3",
+            prompt=prompt,
+            n=1,
+            size=size,
+            response_format="url",
+        )
+        return response.data[0].url
+
+
+def get_backend() -> Any:
+    """Backend choisi par `LLM_BACKEND` (créé au premier appel)."""
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND == "stub":
+            from stub_backend import StubBackend
+            _backend = StubBackend()
+        elif LLM_BACKEND == "openai":
+            _backend = OpenAIBackend()
+        else:
+            raise ValueError(f"LLM_BACKEND inconnu : {LLM_BACKEND}")
+    return _backend
+
+
+def set_backend(backend: Any) -> None:
+    """Remplace le backend du processus (benchmarks, tests de charge)."""
+    global _backend
+    _backend = backend
+
+
+# === APPELS ===
+
+def _messages(prompt: Prompt) -> List[Dict[str, str]]:
+    """Un texte seul devient un message utilisateur ; une liste de messages est envoyée telle quelle."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return prompt
+
+
+def json_format(name: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """`response_format` à envoyer selon `STRUCTURED_OUTPUT` (None : texte libre)."""
+    if STRUCTURED_OUTPUT == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+    if STRUCTURED_OUTPUT == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def _count_tokens(model: str, usage: Any) -> None:
+    if usage is not None:
+        op = operation.get()
+        TOKENS.inc((op, model, "prompt"), usage.prompt_tokens)
+        TOKENS.inc((op, model, "completion"), usage.completion_tokens)
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Coût en USD d'un volume de tokens, ou None si le prix du modèle est inconnu."""
+    if model not in MODEL_PRICES:
+        return None
+    prompt_price, completion_price = MODEL_PRICES[model]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def _budget(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens réservés sur le budget TPM : prompt estimé (~4 caractères par token) + `max_tokens`."""
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+
+async def chat_completion(
+    prompt: Prompt,
+    max_tokens: int,
+    temperature: Optional[float] = None,
+    model: str = "gpt-4o",
+    priority: int = INTERACTIVE,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Envoie un prompt (texte ou messages) et renvoie le texte de la réponse sans bloquer la boucle d'événements."""
+    content, _ = await chat_completion_with_usage(prompt, max_tokens, temperature, model, priority, response_format)
+    return content
+
+
+async def chat_completion_with_usage(
+    prompt: Prompt,
+    max_tokens: int,
+    temperature: Optional[float] = None,
+    model: str = "gpt-4o",
+    priority: int = INTERACTIVE,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Any]:
+    """Comme `chat_completion`, avec l'usage facturé (`prompt_tokens`, `completion_tokens`, ou None)."""
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    messages = _messages(prompt)
+
+    content, usage = await chat_scheduler.run(
+        lambda: get_backend().chat(messages, model, max_tokens, **kwargs),
+        tokens=_budget(messages, max_tokens),
+        priority=priority,
+    )
+    _count_tokens(model, usage)
+    return content, usage
+
+
+async def stream_chat_completion(
+    prompt: Prompt,
+    max_tokens: int,
+    temperature: Optional[float] = None,
+    model: str = "gpt-4o",
+    priority: int = INTERACTIVE,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """
+    Comme `chat_completion`, mais produit le texte au fil des tokens reçus. La place
+    dans l'ordonnanceur est tenue jusqu'à la fin du flux ; seule l'ouverture du flux
+    est rejouée en cas d'erreur transitoire.
+    """
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    messages = _messages(prompt)
+
+    chunks, start = await chat_scheduler.open(
+        lambda: get_backend().stream(messages, model, max_tokens, **kwargs),
+        tokens=_budget(messages, max_tokens),
+        priority=priority,
+    )
+    try:
+        async for text, usage in chunks:
+            if text:
+                yield text
+            if usage is not None:
+                _count_tokens(model, usage)
+    finally:
+        chat_scheduler.finish(start)
+
+
+async def generate_image(prompt: str, size: str = "1024x1024") -> str:
+    """Génère une image avec DALL·E 3 et renvoie son URL."""
+    return await images_scheduler.run(lambda: get_backend().image(prompt, size), tokens=0)
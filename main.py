@@ -1,44 +1,32 @@
 import os
-import json
-import re
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Body
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
-import openai
-from openai import OpenAI
+
+from batch import BATCH_DEFAULT_CONCURRENCY
+from image_jobs import ImageJobs, image_jobs_router
+from image_store import ImageStore
+from matching import Matching, matching_router
+from personality import PersonalityAnalysis
+from schemas import MatchingBatchOptions
+from scenarios import ScenarioPool
+from server import create_app
 import replicate
 
 # === CONFIGURATION ===
 
 load_dotenv()
 
-api_key = os.getenv("API_KEY")
 replicate_token = os.getenv("REPLICATE_API_TOKEN")
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 if replicate_token:
     os.environ["REPLICATE_API_TOKEN"] = replicate_token
 else:
     print("⚠️  REPLICATE_API_TOKEN n'est pas défini dans le fichier .env")
 
-client = OpenAI(
-    base_url="https://models.inference.ai.azure.com",
-    api_key=api_key,
-)
-
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
 
 # === SCHEMAS ===
 
@@ -51,6 +39,11 @@ class ImagePersonalityRequest(BaseModel):
     image_prompt: str
     description: str
 
+class ImagePersonalityBatchRequest(BaseModel):
+    items: List[ImagePersonalityRequest]
+    concurrence: int = BATCH_DEFAULT_CONCURRENCY
+    timeout: float = 120.0
+
 class Offre(BaseModel):
     description: str
     niveauExperience: str
@@ -62,7 +55,32 @@ class Offre(BaseModel):
 
 class MatchingScoreRequest(BaseModel):
     cv: str
-    offre: Offre
+    offre: Optional[Offre] = None
+    offre_id: Optional[str] = None
+
+class MatchingBatchRequest(MatchingBatchOptions):
+    offre: Optional[Offre] = None
+    offres: List[Offre] = []
+
+def offre_prompt(offre: Offre) -> str:
+    """Section « Offre d'emploi » du prompt de matching."""
+    return "\n".join([
+        f"Description: {offre.description}",
+        f"Niveau d'expérience: {offre.niveauExperience}",
+        f"Niveau d’étude: {offre.niveauEtude}",
+        f"Responsabilités: {offre.responsabilite}",
+        f"Expérience demandée: {offre.experience}",
+        f"Pays: {offre.pays}",
+        f"Ville: {offre.ville}",
+    ])
+
+matching = Matching("main", Offre, offre_prompt)
+
+# Images : tâches de fond + magasin local, stock d'images par scénario
+image_jobs = ImageJobs(ImageStore())
+scenario_pool = ScenarioPool(image_jobs)
+
+personality = PersonalityAnalysis("main")
 
 # === ROUTES ===
 
@@ -162,113 +180,43 @@ async def generate_test(offre: OffreInput) -> Dict[str, Any]:
     return {"questions": questions}
     
     '''
-@app.post("/generate-image-question")
-async def generate_image_question(data: ImageQuestionRequest) -> Dict[str, str]:
-    prompt = f"""
-    Génère une illustration simple représentant une situation professionnelle reflétant la personnalité d’un candidat.
-    Pas de texte. Style clair, épuré.
-
-    CV : {data.cv}
-    Offre : {data.offre}
-
-    Exemples :
-    - Personne échangeant calmement en salle de réunion
-    - Personne aidant un collègue à résoudre un problème
-    - Personne concentrée seule dans un bureau
-    """
-
+@router.post("/generate-image-question")
+async def generate_image_question(data: ImageQuestionRequest, request: Request) -> Dict[str, str]:
+    # Image pré-générée du scénario correspondant au couple (CV, offre)
     try:
-        response = openai.images.generate(
-            model="dall-e-3",
-            prompt=prompt.strip(),
-            n=1,
-            size="1024x1024",
-            response_format="url"
-        )
-        image_url = response.data[0].url
-        return {"image_url": image_url, "description_auto": prompt.strip()}
+        served = await scenario_pool.image(data.cv, data.offre)
+        return {
+            "image_url": str(request.url_for("stored_image", name=served["image"])),
+            "description_auto": served["description_auto"],
+            "scenario": served["scenario"],
+        }
     except Exception as e:
         return {"error": f"Erreur lors de la génération de l'image : {str(e)}"}
 
-@app.post("/analyze-personality")
-async def analyze_personality(data: ImagePersonalityRequest) -> Dict[str, str]:
-    prompt = f"""
-    Voici une image représentant une scène professionnelle : elle a été générée selon cette intention :
-    "{data.image_prompt}"
-
-    Le candidat a ensuite rédigé la description suivante :
-    "{data.description}"
+@router.get("/generate-image-question/scenarios")
+async def scenario_pool_stats() -> Dict[str, Any]:
+    return scenario_pool.stats()
 
-    Analyse de manière concise la personnalité du candidat, en te concentrant sur :
-    - Les traits de personnalité principaux (ex : leader, analytique, orienté équipe, etc.)
-    - Son approche du travail et de la collaboration.
-    - Sa réaction probable face à une situation similaire à celle décrite.
-
-    Réponds de manière brève et directe, en résumant les éléments clés de la personnalité du candidat.
-    """
+@router.post("/analyze-personality")
+async def analyze_personality(data: ImagePersonalityRequest) -> Dict[str, str]:
+    return await personality.analyze(data.image_prompt, data.description)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt.strip()}],
-            max_tokens=150
-        )
-        content = response.choices[0].message.content.strip()
-        return {"personality_analysis": content}
-    except Exception as e:
-        return {"error": f"Erreur lors de l'analyse: {str(e)}"}
+@router.post("/analyze-personality/batch")
+async def analyze_personality_batch(data: ImagePersonalityBatchRequest) -> Dict[str, Any]:
+    """Analyses groupées par image (un appel par paquet), repli unitaire si une analyse manque."""
+    return await personality.batch(data.items, data.concurrence, data.timeout)
 
-@app.post("/match-cv-offre")
-async def match_cv_offre(data: MatchingScoreRequest) -> Dict[str, Any]:
-    offre = data.offre
+@router.get("/analyze-personality/stats")
+async def personality_stats() -> Dict[str, Any]:
+    return personality.stats()
 
-    prompt = f"""
-    Tu es un assistant RH expert en recrutement. Ta tâche est d'analyser le niveau de correspondance entre un CV et une offre d'emploi.
-
-    CV :
-    {data.cv}
-
-    Offre d'emploi :
-    Description: {offre.description}
-    Niveau d'expérience: {offre.niveauExperience}
-    Niveau d’étude: {offre.niveauEtude}
-    Responsabilités: {offre.responsabilite}
-    Expérience demandée: {offre.experience}
-    Pays: {offre.pays}
-    Ville: {offre.ville}
-
-    Analyse les similarités entre :
-    - Les expériences du candidat et les responsabilités demandées
-    - Le niveau d’étude et d’expérience
-    - Les compétences techniques et comportementales
-
-    Donne :
-    - Un score de matching entre 0 et 100
-    - Une évaluation brève de l'adéquation du profil
-    - Les points forts et les écarts
-
-    Réponds uniquement au format JSON :
-    {{
-        "score": 87,
-        "evaluation": "Le profil est globalement adapté au poste, avec une bonne expérience en gestion de projet.",
-        "points_forts": ["Expérience similaire", "Bonne communication"],
-        "ecarts": ["Manque de certification demandée"]
-    }}
-    """
+router.include_router(matching_router(matching, MatchingScoreRequest, MatchingBatchRequest))
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt.strip()}],
-            max_tokens=500
-        )
-    except Exception as e:
-        return {"error": f"Erreur lors de l'appel à OpenAI: {str(e)}"}
+router.include_router(image_jobs_router(
+    image_jobs,
+    ImageQuestionRequest,
+    lambda data: scenario_pool.prompt(data.cv, data.offre),
+))
 
-    content = response.choices[0].message.content
-    cleaned_content = re.sub(r"^```json\n?|```$", "", content.strip(), flags=re.MULTILINE)
-
-    try:
-        return json.loads(cleaned_content)
-    except json.JSONDecodeError:
-        return {"error": "La réponse de l'IA n'est pas un JSON valide", "raw": content}
\ No newline at end of file
+# Application autonome (uvicorn main:app) ; app.py monte le même routeur sous /v1
+app = create_app({"": router})
@@ -0,0 +1,298 @@
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from batch import ndjson_lines, result_entry, run_ordered
+from cache import cache_from_env, cache_key
+from compaction import CV_TOKEN_BUDGET_MATCH, compact_cv
+from extraction import extract_json
+from fastjson import FastJSONResponse
+from llm import chat_completion_with_usage, cost, json_format
+from metrics import CASCADE_DECISIONS, operation, parsed, phase
+from near_dup import NEAR_DUP_THRESHOLD, NearDupIndex
+from offre_index import OFFRE_INDEX_DIR, OffreIndex
+from prefilter import reject_pairs, rejection, term_features
+from prompts import TEMPLATES
+from scheduler import BATCH, INTERACTIVE
+from schemas import MATCH_SCHEMA, MatchResponse, MatchResult
+from singleflight import SingleFlight
+
+# Cascade : un modèle rapide note d'abord, le modèle principal ne revoit que les scores
+# de la bande d'incertitude (et les réponses inexploitables). "" : pas de cascade.
+MATCH_CASCADE_MODEL = os.getenv("MATCH_CASCADE_MODEL", "")
+MATCH_CASCADE_BAND = os.getenv("MATCH_CASCADE_BAND", "40-75")
+
+
+def parse_band(value: str) -> Tuple[int, int]:
+    """« 40-75 » -> (40, 75), bornes incluses."""
+    low, _, high = value.partition("-")
+    return int(low), int(high)
+
+
+class Matching:
+    """
+    Matching CV / offre d'une version de l'API : gabarit de prompt, cache des
+    réponses et registre d'offres propres à la version (`variante`).
+    """
+
+    def __init__(
+        self,
+        variante: str,
+        offre_model: Type[BaseModel],
+        offre_prompt: Callable[[Any], str],
+        model: str = "gpt-4o",
+        cascade_model: str = MATCH_CASCADE_MODEL,
+        band: Tuple[int, int] = parse_band(MATCH_CASCADE_BAND),
+        cv_budget: int = CV_TOKEN_BUDGET_MATCH,
+        near_dup_threshold: float = NEAR_DUP_THRESHOLD,
+    ):
+        self.variante = variante
+        self.offre_model = offre_model
+        self.offre_prompt = offre_prompt
+        self.model = model
+        self.template = TEMPLATES[f"{variante}_match"]
+        self.cache = cache_from_env("MATCH")
+        self.index = OffreIndex(os.path.join(OFFRE_INDEX_DIR, variante))
+        self.inflight = SingleFlight(f"{variante}_match")
+        self.response_format = json_format("match", MATCH_SCHEMA)
+        self.cascade_model = cascade_model
+        self.band = band
+        self.decisions: Dict[str, int] = {}
+        self.tiers: Dict[str, Dict[str, float]] = {}
+        self.cv_budget = cv_budget
+        self.band_gap = [0, 0]  # écarts |rapide - principal| cumulés sur la bande, nombre
+        self.near_dups = NearDupIndex(near_dup_threshold) if near_dup_threshold > 0 else None
+
+    @property
+    def route_key(self) -> str:
+        """Modèles (et bande) qui produisent le score : entre dans la clé du cache."""
+        if not self.cascade_model:
+            return self.model
+        return f"{self.cascade_model}>{self.model}:{self.band[0]}-{self.band[1]}"
+
+    def register(self, offre: BaseModel) -> str:
+        return self.index.register(offre.model_dump(), self.offre_prompt(offre))
+
+    def resolve(self, offre: Optional[BaseModel], offre_id: Optional[str]) -> Tuple[Any, str, Optional[List[int]]]:
+        """Offre complète ou référence vers le registre : (offre, fragment de prompt, termes hachés)."""
+        if offre_id is not None:
+            entry = self.index.get(offre_id)
+            if entry is None:
+                raise HTTPException(status_code=404, detail=f"Offre inconnue : {offre_id}")
+            return self.offre_model.model_construct(**entry.fields), entry.fragment, self.index.features(entry)
+        if offre is None:
+            raise HTTPException(status_code=422, detail="Il faut fournir `offre` ou `offre_id`.")
+        return offre, self.offre_prompt(offre), None
+
+    async def score(
+        self, cv: str, offre: BaseModel, fragment: Optional[str] = None, priority: int = INTERACTIVE
+    ) -> Dict[str, Any]:
+        operation.set("match")
+        # CV nettoyé et tenu sous budget avant la clé de cache : deux mises en page du même CV se rejoignent
+        cv, cv_tokens = compact_cv(cv, self.cv_budget, "match")
+        key = cache_key({"cv": cv, "offre": offre.model_dump()}, f"{self.route_key}/{self.template.version}")
+        result = self.cache.get(key)
+        if result is None and self.near_dups is not None:
+            reused = self._reuse(cv, self._scope(offre))
+            if reused is not None:
+                return {**reused, "cv_tokens": cv_tokens}
+        if result is None:
+            result = await self.inflight.do(key, lambda: self._score_uncached(key, cv, offre, fragment, priority))
+        return {**result, "cv_tokens": cv_tokens}
+
+    def _scope(self, offre: BaseModel) -> str:
+        """Portée de l'index des quasi-doublons : offre, modèles et version du prompt."""
+        return cache_key(offre.model_dump(), f"{self.route_key}/{self.template.version}")
+
+    def _reuse(self, cv: str, scope: str) -> Optional[Dict[str, Any]]:
+        """
+        Résultat d'un CV quasi identique déjà noté pour la même offre, marqué `reutilise`.
+        Seuls les CV réellement notés servent de référence : pas de dérive de proche en proche.
+        """
+        found = self.near_dups.find(cv, scope)
+        if found is None:
+            return None
+        result = self.cache.get(found[0])
+        if result is None:
+            return None  # résultat évincé du cache : nouvelle notation
+        return {**result, "reutilise": True, "similarite_cv": round(found[1], 4)}
+
+    async def _score_uncached(
+        self, key: str, cv: str, offre: BaseModel, fragment: Optional[str], priority: int
+    ) -> Dict[str, Any]:
+        fragment = fragment or self.offre_prompt(offre)
+        prompt = self.template.messages(cv=cv, fragment=fragment)
+        if self.cascade_model:
+            result = await self._cascade(prompt, priority)
+        else:
+            result = await self._call(prompt, self.model, priority)
+        if "error" not in result:
+            self.cache.set(key, result)
+            if self.near_dups is not None:
+                self.near_dups.add(cv, self._scope(offre), key)
+        return result
+
+    async def _call(self, prompt: List[Dict[str, str]], model: str, priority: int) -> Dict[str, Any]:
+        """Un appel à `model` : résultat validé, ou erreur (avec `raw` si la réponse est inexploitable)."""
+        tier = self.tiers.setdefault(model, {"appels": 0, "secondes": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        tier["appels"] += 1
+        start = time.perf_counter()
+        try:
+            content, usage = await chat_completion_with_usage(
+                prompt, max_tokens=500, model=model, priority=priority, response_format=self.response_format
+            )
+        except Exception as e:
+            return {"error": f"Erreur lors de l'appel à OpenAI: {str(e)}"}
+        finally:
+            tier["secondes"] += time.perf_counter() - start
+        if usage is not None:
+            tier["prompt_tokens"] += usage.prompt_tokens
+            tier["completion_tokens"] += usage.completion_tokens
+
+        try:
+            with phase("parse"):
+                value = extract_json(content)
+            with phase("validate"):
+                result = MatchResult.model_validate(value).model_dump()
+        except (ValueError, ValidationError):
+            parsed(False)
+            return {"error": "La réponse de l'IA n'est pas un JSON valide", "raw": content}
+        parsed(True)
+        return result
+
+    async def _cascade(self, prompt: List[Dict[str, str]], priority: int) -> Dict[str, Any]:
+        first = await self._call(prompt, self.cascade_model, priority)
+        if "error" in first:
+            decision = "escalade_invalide" if "raw" in first else "escalade_erreur"
+        elif self.band[0] <= first["score"] <= self.band[1]:
+            decision = "escalade_bande"
+        else:
+            decision = "rapide"
+        self.decisions[decision] = self.decisions.get(decision, 0) + 1
+        CASCADE_DECISIONS.inc((self.variante, decision))
+        if decision == "rapide":
+            return {**first, "modele": self.cascade_model}
+
+        second = await self._call(prompt, self.model, priority)
+        if "error" in second:
+            # Le modèle principal a échoué : le score rapide, même incertain, vaut mieux qu'une erreur
+            return {**first, "modele": self.cascade_model} if "error" not in first else second
+        if decision == "escalade_bande":
+            self.band_gap[0] += abs(first["score"] - second["score"])
+            self.band_gap[1] += 1
+        return {**second, "modele": self.model}
+
+    def cascade_stats(self) -> Dict[str, Any]:
+        """Décisions de routage, latence, tokens et coût par modèle, pour régler la bande."""
+        tiers = {}
+        total_cost = 0.0
+        for model, tier in self.tiers.items():
+            tier_cost = cost(model, tier["prompt_tokens"], tier["completion_tokens"])
+            total_cost += tier_cost or 0.0
+            tiers[model] = {
+                "appels": tier["appels"],
+                "latence_moyenne": tier["secondes"] / tier["appels"] if tier["appels"] else 0.0,
+                "prompt_tokens": tier["prompt_tokens"],
+                "completion_tokens": tier["completion_tokens"],
+                "cout_usd": tier_cost,
+            }
+        stats: Dict[str, Any] = {
+            "cascade": bool(self.cascade_model),
+            "modele_rapide": self.cascade_model or None,
+            "modele_principal": self.model,
+            "bande": list(self.band),
+            "decisions": self.decisions,
+            "niveaux": tiers,
+            "cout_usd": total_cost,
+            "ecart_moyen_bande": self.band_gap[0] / self.band_gap[1] if self.band_gap[1] else None,
+        }
+        # Coût estimé si chaque couple avait été noté par le modèle principal seul
+        first_pass = self.tiers.get(self.cascade_model, {}).get("appels", 0)
+        main = tiers.get(self.model)
+        if self.cascade_model and main and main["appels"] and main["cout_usd"] is not None:
+            stats["cout_sans_cascade_usd"] = main["cout_usd"] / main["appels"] * first_pass
+        return stats
+
+    async def batch(self, data) -> Any:
+        offres = [self.resolve(o, None) for o in ([data.offre] if data.offre else []) + data.offres]
+        offres += [self.resolve(None, offre_id) for offre_id in data.offre_ids]
+        if not offres or not data.cvs:
+            raise HTTPException(status_code=422, detail="Il faut au moins un CV et une offre.")
+
+        # Matrice CV × offres aplatie ligne par ligne (CV i, offre j)
+        pairs = [(cv, offre, fragment) for cv in data.cvs for offre, fragment, _ in offres]
+
+        # Pré-filtre local : les couples trop éloignés n'atteignent pas le modèle
+        offre_terms = [
+            terms if terms is not None else term_features(" ".join(offre.model_dump().values()))
+            for offre, _, terms in offres
+        ]
+        rejected = reject_pairs(data.cvs, offre_terms, data.seuil, data.top_k)
+
+        def describe(index: int) -> Dict[str, Any]:
+            return {"index": index, "cv_index": index // len(offres), "offre_index": index % len(offres)}
+
+        async def worker(index: int):
+            if index in rejected:
+                return rejection(rejected[index])
+            return await self.score(*pairs[index], priority=BATCH)
+
+        indices = range(len(pairs))
+        if data.stream:
+            return StreamingResponse(
+                ndjson_lines(indices, worker, data.concurrence, data.timeout, describe),
+                media_type="application/x-ndjson",
+            )
+
+        results = await run_ordered(indices, worker, data.concurrence, data.timeout)
+        items = [{**describe(i), **result_entry(r)} for i, r in enumerate(results)]
+        return FastJSONResponse({
+            "resultats": items,
+            "total": len(items),
+            "echecs": sum(1 for item in items if not item["ok"]),
+            "prefiltres": len(rejected),
+        })
+
+
+def matching_router(
+    matching: Matching,
+    score_request: Type[BaseModel],
+    batch_request: Type[BaseModel],
+) -> APIRouter:
+    """Routes /offres et /match-cv-offre* d'une version, typées par ses propres modèles."""
+    router = APIRouter()
+    offre_model = matching.offre_model
+
+    @router.post("/offres")
+    async def register_offre(offre: offre_model) -> Dict[str, str]:
+        return {"offre_id": matching.register(offre)}
+
+    @router.post("/match-cv-offre", response_model=MatchResponse, response_class=FastJSONResponse)
+    async def match_cv_offre(data: score_request) -> Response:
+        offre, fragment, _ = matching.resolve(data.offre, data.offre_id)
+        # Résultat déjà validé par `MatchResult` (ou erreur construite ici) : rendu direct
+        return FastJSONResponse(await matching.score(data.cv, offre, fragment))
+
+    @router.post("/match-cv-offre/batch")
+    async def match_cv_offre_batch(data: batch_request):
+        return await matching.batch(data)
+
+    @router.get("/match-cv-offre/cache")
+    async def match_cache_stats() -> Dict[str, Any]:
+        return matching.cache.stats()
+
+    @router.get("/match-cv-offre/cascade")
+    async def match_cascade_stats() -> Dict[str, Any]:
+        """Routage en cascade : décisions, latence et coût par modèle."""
+        return matching.cascade_stats()
+
+    @router.get("/match-cv-offre/quasi-doublons")
+    async def match_near_dup_stats() -> Dict[str, Any]:
+        """Index des CV quasi identiques : taille, mémoire et réutilisations."""
+        return matching.near_dups.stats() if matching.near_dups is not None else {"actif": False}
+
+    return router
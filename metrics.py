@@ -0,0 +1,194 @@
+import bisect
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Opération métier en cours (match, test, personality…), propagée aux tâches filles
+operation: contextvars.ContextVar = contextvars.ContextVar("operation", default="autre")
+
+_METRICS: List["_Metric"] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# === TYPES DE MESURES ===
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _METRICS.append(self)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(_Metric):
+    """Compteur monotone ; `inc` ne fait qu'une addition dans un dict (pas de verrou : une seule boucle)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), value: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def get(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def series(self) -> Dict[Tuple[str, ...], float]:
+        return dict(self._values)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value:g}"
+
+
+class Histogram(_Metric):
+    """Histogramme à seaux fixes ; les comptes sont cumulés seulement à l'export."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # comptes par seau (+Inf), somme
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, labels: Tuple[str, ...]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(labels, time.perf_counter() - start)
+
+    def samples(self) -> Iterator[str]:
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                le = 'le="%s"' % (bound if isinstance(bound, str) else f"{bound:g}")
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]:g}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Gauge(_Metric):
+    """Valeurs lues à l'export (état des files, caches…) : aucun coût sur le chemin chaud."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value:g}"
+
+
+# === MESURES DU SERVICE ===
+
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route", ("method", "route", "status")
+)
+PHASE_SECONDS = Histogram(
+    "llm_phase_duration_seconds",
+    "Durée des appels au modèle par phase (queue, upstream, parse, validate)",
+    ("operation", "phase"),
+)
+TOKENS = Counter("llm_tokens_total", "Tokens facturés par le fournisseur", ("operation", "model", "kind"))
+PARSES = Counter("llm_parse_total", "Réponses du modèle analysées", ("operation",))
+PARSE_FAILURES = Counter(
+    "llm_parse_failures_total", "Réponses du modèle inexploitables (JSON ou schéma)", ("operation",)
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Consultations des caches de réponses", ("cache", "result"))
+CV_TOKENS = Counter("cv_tokens_total", "Tokens des CV avant et après compaction", ("route", "etape"))
+CASCADE_DECISIONS = Counter(
+    "match_cascade_decisions_total", "Décisions du routage en cascade du matching", ("variante", "decision")
+)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Chronomètre une phase de l'opération en cours."""
+    with PHASE_SECONDS.time((operation.get(), name)):
+        yield
+
+
+def parsed(ok: bool) -> None:
+    op = operation.get()
+    PARSES.inc((op,))
+    if not ok:
+        PARSE_FAILURES.inc((op,))
+
+
+def render() -> str:
+    """Toutes les mesures au format texte Prometheus."""
+    return "\n".join(metric.render() for metric in _METRICS) + "\n"
+
+
+# === MIDDLEWARE ===
+
+class MetricsMiddleware:
+    """Middleware ASGI brut (sans BaseHTTPMiddleware) : durée de chaque requête par gabarit de route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_SECONDS.observe((scope["method"], route_path(scope), status[0]), time.perf_counter() - start)
+
+
+# Clé du scope ASGI où `server.create_app` note le préfixe du routeur inclus (/v1, /v2, /v3)
+ROUTE_PREFIX_KEY = "route_prefix"
+
+
+def route_path(scope) -> str:
+    """
+    Gabarit complet de la route servie : montage (`root_path`), préfixe de version
+    noté par `create_app`, puis `route.path`, relatif au routeur inclus. Jamais le
+    chemin brut : une URL inconnue est comptée sous « non_routee ».
+    """
+    route = scope.get("route")
+    if route is None:
+        return "non_routee"
+    return scope.get("root_path", "") + scope.get(ROUTE_PREFIX_KEY, "") + route.path
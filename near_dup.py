@@ -0,0 +1,246 @@
+import hashlib
+import os
+import re
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from compaction import strip_phones
+from metrics import CACHE_REQUESTS
+
+# Réutilisation des résultats de matching pour les CV quasi identiques (date, téléphone,
+# compétences réordonnées) : similarité de Jaccard estimée par MinHash, candidats par LSH.
+# Seuil 0 (défaut) : pas de réutilisation ; 0.9 est un bon point de départ.
+NEAR_DUP_THRESHOLD = float(os.getenv("MATCH_NEAR_DUP_THRESHOLD", "0"))
+NEAR_DUP_PERMS = int(os.getenv("MATCH_NEAR_DUP_PERMS", "128"))
+NEAR_DUP_BANDS = int(os.getenv("MATCH_NEAR_DUP_BANDS", "16"))
+
+SHINGLE_WORDS = 3
+_PENDING_MAX = 4096  # entrées ajoutées avant fusion dans les tables triées
+
+# Segments (lignes, éléments de liste) puis mots et nombres. Seuls les téléphones et les
+# dates sont retirés : années d'expérience, niveau de diplôme ou durées changent le score.
+_SEGMENTS = re.compile(r"[\n,;|•·]+")
+_WORDS = re.compile(r"[^\W_]+")
+_MONTHS = (
+    r"janv(?:ier)?|fevr?(?:ier)?|mars|avr(?:il)?|mai|juin|juil(?:let)?|aout|sept?(?:embre)?|oct(?:obre)?"
+    r"|nov(?:embre)?|dec(?:embre)?|jan(?:uary)?|feb(?:ruary)?|march|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|september|october|november|december"
+)
+# « 03/2019 », « 12.03.2019 », « 2019 », « mars 2019 », « Sept. 2021 » (texte déjà sans accents)
+_DATES = re.compile(rf"(?<![\w+])(?:(?:{_MONTHS})\.?\s+)?(?:\d{{1,2}}[/.-]){{0,2}}(?:19|20)\d{{2}}(?!\w)")
+_MARKS = re.compile(r"[\u0300-\u036f]+")  # diacritiques isolés par NFKD
+
+
+# === EMPREINTES ===
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> Set[str]:
+    """
+    Ensemble des k-grammes de mots du texte normalisé (minuscules, sans accents, sans
+    téléphones ni dates). Ils sont pris dans chaque segment séparément : réordonner
+    les lignes ou une liste de compétences ne change pas l'ensemble.
+    """
+    text = _MARKS.sub("", unicodedata.normalize("NFKD", strip_phones(text).lower()))
+    text = _DATES.sub(" ", text)
+    found = set()
+    for segment in _SEGMENTS.split(text):
+        words = _WORDS.findall(segment)
+        if len(words) <= k:
+            if words:
+                found.add(" ".join(words))
+            continue
+        found.update(" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return found
+
+
+class MinHasher:
+    """
+    Signatures MinHash à `perms` permutations (hachage multiply-shift sur 64 bits),
+    dont seul l'octet de poids faible est gardé (b-bit MinHash) : 1 octet par
+    permutation au lieu de 4 ou 8.
+    """
+
+    def __init__(self, perms: int = NEAR_DUP_PERMS, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.perms = perms
+        self._a = rng.integers(0, 2 ** 63, perms, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, perms, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature (uint8, `perms`) du texte, ou None s'il ne contient aucun mot."""
+        found = shingles(text)
+        if not found:
+            return None
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in found), dtype=np.uint64, count=len(found))
+        with np.errstate(over="ignore"):
+            hashed = (x[:, None] * self._a + self._b) >> np.uint64(32)
+        return (hashed.min(axis=0) & np.uint64(0xFF)).astype(np.uint8)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Jaccard estimé entre la signature `a` et chaque ligne de `b` : sur un octet, deux
+    minima différents coïncident encore une fois sur 256, ce que l'on retranche.
+    """
+    agree = (b == a).mean(axis=-1)
+    return np.clip((agree - 1 / 256) / (1 - 1 / 256), 0.0, 1.0)
+
+
+# === INDEX LSH ===
+
+class NearDupIndex:
+    """
+    Index des CV déjà notés, par portée (offre + version du prompt et des modèles) :
+    signature, portée et clé du résultat en cache sont rangées dans des tableaux
+    NumPy, et chacune des `bands` bandes de la signature dans une table triée
+    (clé 32 bits, ligne), interrogée par dichotomie. Les derniers ajouts restent
+    dans un tampon parcouru linéairement, fusionné par paquets.
+
+    Environ 8 × `bands` + `perms` + 40 octets par CV (~300 Mo pour un million avec
+    les valeurs par défaut), en mémoire du processus.
+    """
+
+    def __init__(
+        self,
+        threshold: float = NEAR_DUP_THRESHOLD,
+        perms: int = NEAR_DUP_PERMS,
+        bands: int = NEAR_DUP_BANDS,
+        seed: int = 0,
+    ):
+        if perms % bands:
+            raise ValueError(f"MATCH_NEAR_DUP_PERMS ({perms}) doit être un multiple de MATCH_NEAR_DUP_BANDS ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = perms // bands
+        self.hasher = MinHasher(perms, seed)
+        rng = np.random.default_rng(seed + 1)
+        self._row_mult = rng.integers(0, 2 ** 63, self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._band_mult = rng.integers(0, 2 ** 63, bands, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self._size = 0
+        self._sigs = np.zeros((0, perms), dtype=np.uint8)
+        self._scopes = np.zeros(0, dtype=np.uint64)
+        self._keys = np.zeros((0, 32), dtype=np.uint8)
+        self._band_keys = np.zeros((bands, 0), dtype=np.uint32)  # triées par bande
+        self._band_rows = np.zeros((bands, 0), dtype=np.uint32)
+        self._pending = np.zeros((_PENDING_MAX, bands), dtype=np.uint32)  # clés de bande des lignes non fusionnées
+        self._pending_rows: Dict[Tuple[int, int], List[int]] = {}  # (bande, clé) -> lignes du tampon
+        self._merged = 0
+        self.lookups = 0
+        self.reused = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _scope(scope: str) -> np.uint64:
+        return np.uint64(int.from_bytes(hashlib.blake2b(scope.encode("utf-8"), digest_size=8).digest(), "little"))
+
+    def _band_hashes(self, sig: np.ndarray, scope: np.uint64) -> np.ndarray:
+        """Clé 32 bits de chaque bande, salée par la portée : une offre ne rencontre que ses CV."""
+        with np.errstate(over="ignore"):
+            mixed = (sig.reshape(self.bands, self.rows).astype(np.uint64) * self._row_mult).sum(axis=1)
+            mixed = (mixed + scope) * self._band_mult
+        return (mixed >> np.uint64(32)).astype(np.uint32)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._scopes)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name in ("_sigs", "_scopes", "_keys"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _merge(self) -> None:
+        """Insère le tampon dans les tables triées (tri du seul tampon, puis insertion ordonnée)."""
+        pending = self._pending[:self._size - self._merged]
+        if not len(pending):
+            return
+        rows = np.arange(self._merged, self._size, dtype=np.uint32)
+        keys, band_rows = [], []
+        for band in range(self.bands):
+            order = np.argsort(pending[:, band], kind="stable")
+            new_keys = pending[order, band]
+            at = np.searchsorted(self._band_keys[band], new_keys, side="right")
+            keys.append(np.insert(self._band_keys[band], at, new_keys))
+            band_rows.append(np.insert(self._band_rows[band], at, rows[order]))
+        self._band_keys = np.stack(keys)
+        self._band_rows = np.stack(band_rows)
+        self._pending_rows.clear()
+        self._merged = self._size
+
+    def add(self, text: str, scope: str, key: str) -> None:
+        """Enregistre un CV noté : `key` est la clé de cache (SHA-256 hexadécimal) de son résultat."""
+        sig = self.hasher.signature(text)
+        if sig is None:
+            return
+        scope_hash = self._scope(scope)
+        self._grow(self._size + 1)
+        self._sigs[self._size] = sig
+        self._scopes[self._size] = scope_hash
+        self._keys[self._size] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        bands = self._band_hashes(sig, scope_hash)
+        self._pending[self._size - self._merged] = bands
+        for band, band_key in enumerate(bands.tolist()):
+            self._pending_rows.setdefault((band, band_key), []).append(self._size)
+        self._size += 1
+        if self._size - self._merged >= _PENDING_MAX:
+            self._merge()
+
+    def find(self, text: str, scope: str) -> Optional[Tuple[str, float]]:
+        """(clé de cache, Jaccard estimé) du CV le plus proche de même portée au-dessus du seuil, sinon None."""
+        self.lookups += 1
+        sig = self.hasher.signature(text)
+        if sig is None or not self._size:
+            CACHE_REQUESTS.inc(("quasi_doublons", "miss"))
+            return None
+        scope_hash = self._scope(scope)
+        bands = self._band_hashes(sig, scope_hash)
+
+        found: List[int] = []
+        merged = self._band_keys.shape[1]
+        for band, band_key in enumerate(bands):  # scalaires uint32 : searchsorted sans conversion du tableau
+            found += self._pending_rows.get((band, int(band_key)), ())
+            keys = self._band_keys[band]
+            at = int(keys.searchsorted(band_key))
+            while at < merged and keys[at] == band_key:
+                found.append(int(self._band_rows[band, at]))
+                at += 1
+        if not found:
+            CACHE_REQUESTS.inc(("quasi_doublons", "miss"))
+            return None
+        candidates = np.unique(np.array(found, dtype=np.intp))
+        candidates = candidates[self._scopes[candidates] == scope_hash]
+        if not len(candidates):
+            CACHE_REQUESTS.inc(("quasi_doublons", "miss"))
+            return None
+
+        similarity = jaccard(sig, self._sigs[candidates])
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            CACHE_REQUESTS.inc(("quasi_doublons", "miss"))
+            return None
+        self.reused += 1
+        CACHE_REQUESTS.inc(("quasi_doublons", "hit"))
+        return self._keys[candidates[best]].tobytes().hex(), float(similarity[best])
+
+    def memory(self) -> int:
+        """Octets occupés par les tableaux de l'index (capacité réservée comprise)."""
+        arrays = (self._sigs, self._scopes, self._keys, self._band_keys, self._band_rows, self._pending)
+        return sum(a.nbytes for a in arrays)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seuil": self.threshold,
+            "permutations": self.hasher.perms,
+            "bandes": self.bands,
+            "entrees": self._size,
+            "recherches": self.lookups,
+            "reutilisations": self.reused,
+            "memoire_octets": self.memory(),
+        }
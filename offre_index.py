@@ -0,0 +1,115 @@
+import fcntl
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cache import normalize
+from prefilter import term_features
+
+OFFRE_INDEX_DIR = os.getenv("OFFRE_INDEX_DIR", ".offres")
+
+
+@dataclass
+class OffreEntry:
+    offre_id: str
+    fields: Dict[str, str]
+    text: str
+    fragment: str
+    start: int
+    length: int
+
+
+class OffreIndex:
+    """
+    Registre des offres : chaque offre est normalisée, son fragment de prompt et ses
+    termes hachés (ceux du pré-filtre) sont calculés une seule fois à l'enregistrement.
+
+    Sur disque, `index.jsonl` contient les métadonnées et `features.u32` les termes
+    de toutes les offres bout à bout, relus via un memmap. Les deux fichiers sont
+    partagés par les workers : les ajouts se font sous verrou exclusif (`flock`) et
+    chaque processus relit la fin de `index.jsonl` quand une offre lui est inconnue.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "index.jsonl")
+        self._features_path = os.path.join(directory, "features.u32")
+        self._entries: Dict[str, OffreEntry] = {}
+        self._terms: Optional[np.memmap] = None
+        self._offset = 0  # octets de `index.jsonl` déjà lus
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _read_new(self, f) -> None:
+        """Charge les lignes complètes ajoutées depuis la dernière lecture (par ce processus ou un autre)."""
+        f.seek(self._offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # ligne en cours d'écriture par un autre worker
+            entry = OffreEntry(**json.loads(line))
+            self._entries[entry.offre_id] = entry
+            self._offset += len(line)
+
+    def _refresh(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                self._read_new(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def register(self, fields: Dict[str, str], fragment: str) -> str:
+        fields = normalize(fields)
+        offre_id = hashlib.sha256(
+            json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        if offre_id in self._entries:
+            return offre_id
+
+        text = " ".join(fields.values())
+        features = np.asarray(term_features(text), dtype=np.uint32)
+        with open(self._meta_path, "ab+") as meta:
+            fcntl.flock(meta, fcntl.LOCK_EX)
+            try:
+                # Un autre worker a pu enregistrer la même offre entre-temps
+                self._read_new(meta)
+                if offre_id in self._entries:
+                    return offre_id
+                # Position des termes lue sur le fichier lui-même, sous verrou
+                with open(self._features_path, "ab") as f:
+                    start = f.seek(0, os.SEEK_END) // features.itemsize
+                    f.write(features.tobytes())
+                entry = OffreEntry(offre_id, fields, text, fragment, start, len(features))
+                line = (json.dumps(entry.__dict__, ensure_ascii=False) + "\n").encode("utf-8")
+                meta.seek(0, os.SEEK_END)
+                meta.write(line)
+                meta.flush()
+                self._read_new(meta)
+            finally:
+                fcntl.flock(meta, fcntl.LOCK_UN)
+        return offre_id
+
+    def get(self, offre_id: str) -> Optional[OffreEntry]:
+        entry = self._entries.get(offre_id)
+        if entry is None:
+            self._refresh()  # offre enregistrée par un autre worker
+            entry = self._entries.get(offre_id)
+        return entry
+
+    def features(self, entry: OffreEntry) -> List[int]:
+        if not entry.length:
+            return []
+        end = entry.start + entry.length
+        if self._terms is None or len(self._terms) < end:
+            # Le fichier a grandi (ici ou dans un autre worker) : memmap à rouvrir
+            size = os.path.getsize(self._features_path) // np.dtype(np.uint32).itemsize
+            self._terms = np.memmap(self._features_path, dtype=np.uint32, mode="r", shape=(size,))
+        return self._terms[entry.start:end].tolist()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Sequence
+
+from batch import result_entry, run_ordered
+from extraction import extract_json, validate_items
+from llm import chat_completion, json_format
+from metrics import operation, parsed, phase
+from prompts import TEMPLATES
+from scheduler import BATCH, INTERACTIVE
+from schemas import PERSONALITY_BATCH_SCHEMA, PersonalityOutput
+
+PERSONALITY_BATCH_SIZE = int(os.getenv("PERSONALITY_BATCH_SIZE", "20"))  # candidats par appel groupé
+PERSONALITY_MAX_TOKENS = 150  # par candidat, comme l'appel unitaire
+
+logger = logging.getLogger(__name__)
+
+
+class PersonalityAnalysis:
+    """
+    Analyse de personnalité à partir de la description d'une image. Les candidats
+    qui ont décrit la même image (même `image_prompt`) sont analysés ensemble en un
+    seul appel structuré ; ceux dont l'analyse manque ou est illisible repassent
+    par l'appel unitaire.
+    """
+
+    def __init__(self, variante: str, batch_size: int = PERSONALITY_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.template = TEMPLATES[f"{variante}_personality"]
+        self.batch_template = TEMPLATES[f"{variante}_personality_batch"]
+        self.response_format = json_format("personality_batch", PERSONALITY_BATCH_SCHEMA)
+        self.calls = 0
+        self.grouped_calls = 0
+        self.fallbacks = 0
+
+    async def analyze(self, image_prompt: str, description: str, priority: int = INTERACTIVE) -> Dict[str, str]:
+        operation.set("personality")
+        prompt = self.template.messages(image_prompt=image_prompt, description=description)
+
+        try:
+            self.calls += 1
+            content = await chat_completion(prompt, max_tokens=PERSONALITY_MAX_TOKENS, priority=priority)
+            content = content.strip()
+            return {"personality_analysis": content}
+        except Exception as e:
+            return {"error": f"Erreur lors de l'analyse: {str(e)}"}
+
+    async def _analyze_group(self, image_prompt: str, descriptions: Sequence[str]) -> List[Dict[str, str]]:
+        """Un appel pour tout le groupe ; repli unitaire pour chaque analyse absente."""
+        operation.set("personality")
+        if len(descriptions) == 1:
+            return [await self.analyze(image_prompt, descriptions[0], priority=BATCH)]
+        numbered = "\n".join(f'[{i + 1}] "{d}"' for i, d in enumerate(descriptions))
+        prompt = self.batch_template.messages(image_prompt=image_prompt, descriptions=numbered)
+        analyses: Dict[int, str] = {}
+        try:
+            self.calls += 1
+            self.grouped_calls += 1
+            content = await chat_completion(
+                prompt,
+                max_tokens=PERSONALITY_MAX_TOKENS * len(descriptions),
+                priority=BATCH,
+                response_format=self.response_format,
+            )
+            with phase("parse"):
+                value = extract_json(content)
+            items = value.get("analyses", []) if isinstance(value, dict) else value
+            with phase("validate"):
+                valid, invalid = validate_items(items if isinstance(items, list) else [], PersonalityOutput)
+            analyses = {item.id: item.analyse.strip() for item in valid if item.analyse.strip()}
+            parsed(not invalid and len(analyses) == len(descriptions))
+        except ValueError as e:
+            parsed(False)
+            logger.warning("Analyse groupée illisible, repli unitaire : %s", e)
+        except Exception as e:
+            logger.warning("Analyse groupée en échec, repli unitaire : %s", e)
+
+        async def one(i: int, description: str) -> Dict[str, str]:
+            if i + 1 in analyses:
+                return {"personality_analysis": analyses[i + 1]}
+            self.fallbacks += 1
+            return await self.analyze(image_prompt, description, priority=BATCH)
+
+        return list(await asyncio.gather(*(one(i, d) for i, d in enumerate(descriptions))))
+
+    async def batch(self, items: Sequence[Any], concurrence: int, timeout: float) -> Dict[str, Any]:
+        # Regroupement par image, puis paquets de `batch_size` candidats
+        groups: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            groups.setdefault(item.image_prompt, []).append(index)
+        chunks = [
+            indices[start:start + self.batch_size]
+            for indices in groups.values()
+            for start in range(0, len(indices), self.batch_size)
+        ]
+
+        async def worker(chunk: List[int]):
+            results = await self._analyze_group(
+                items[chunk[0]].image_prompt, [items[i].description for i in chunk]
+            )
+            return {"analyses": results}
+
+        outcomes = await run_ordered(chunks, worker, concurrence, timeout)
+        entries: List[Dict[str, Any]] = [{} for _ in items]
+        for chunk, outcome in zip(chunks, outcomes):
+            for position, index in enumerate(chunk):
+                result = outcome["analyses"][position] if "analyses" in outcome else outcome
+                entries[index] = {"index": index, **result_entry(result)}
+        return {
+            "resultats": entries,
+            "total": len(entries),
+            "echecs": sum(1 for entry in entries if not entry["ok"]),
+            "paquets": len(chunks),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"appels": self.calls, "appels_groupes": self.grouped_calls, "replis_unitaires": self.fallbacks}
@@ -0,0 +1,154 @@
+import math
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.03"))
+PREFILTER_TOP_K = int(os.getenv("PREFILTER_TOP_K", "0")) or None
+N_FEATURES = 1 << 20
+
+_WORD_RE = re.compile(r"[a-z0-9+#]{2,}")
+_STOPWORDS = frozenset("""
+    au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me meme mes
+    moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une
+    vos votre vous est sont ete etre avoir ans an plus tres bien bon bonne the and of to in for with
+""".split())
+
+_hash_cache: Dict[str, int] = {}
+
+
+# === TOKENISATION ===
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def term_features(text: str) -> List[int]:
+    """Indices hachés (stables d'un processus à l'autre) des unigrammes et bigrammes."""
+    words = [w for w in _WORD_RE.findall(_strip_accents(text)) if w not in _STOPWORDS]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    indices = []
+    for term in terms:
+        index = _hash_cache.get(term)
+        if index is None:
+            index = zlib.crc32(term.encode()) & (N_FEATURES - 1)
+            if len(_hash_cache) < 500_000:
+                _hash_cache[term] = index
+        indices.append(index)
+    return indices
+
+
+# === SIMILARITÉ ===
+
+def similarity_matrix(cvs: Sequence[str], offre_features: Sequence[List[int]]) -> np.ndarray:
+    """
+    Cosinus TF-IDF (hachage des termes) entre chaque CV et chaque offre, sous forme
+    de matrice (len(cvs), len(offre_features)). Les offres sont données par leurs
+    termes hachés (`term_features`) ; l'IDF est estimé sur le lot.
+    """
+    features = [term_features(cv) for cv in cvs] + list(offre_features)
+    n_docs = len(features)
+    doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), [len(f) for f in features])
+    feats = np.fromiter(
+        (idx for f in features for idx in f), dtype=np.int64, count=len(doc_ids)
+    )
+
+    # Fréquences (document, terme) puis pondération tf sous-linéaire × idf
+    pair_keys, counts = np.unique(doc_ids * N_FEATURES + feats, return_counts=True)
+    pair_docs = pair_keys // N_FEATURES
+    pair_feats = pair_keys % N_FEATURES
+    df = np.bincount(pair_feats, minlength=N_FEATURES)
+    idf = np.log((1.0 + n_docs) / (1.0 + df[pair_feats])) + 1.0
+    weights = (1.0 + np.log(counts)) * idf
+
+    norms = np.sqrt(np.bincount(pair_docs, weights=weights ** 2, minlength=n_docs))
+    norms[norms == 0] = 1.0
+    weights = weights / norms[pair_docs]
+
+    n_cvs = len(cvs)
+    is_cv = pair_docs < n_cvs
+    cv_docs, cv_feats, cv_weights = pair_docs[is_cv], pair_feats[is_cv], weights[is_cv]
+
+    scores = np.zeros((n_cvs, len(offre_features)), dtype=np.float64)
+    for j in range(len(offre_features)):
+        offre_vector = np.zeros(N_FEATURES, dtype=np.float64)
+        in_offre = pair_docs == n_cvs + j
+        offre_vector[pair_feats[in_offre]] = weights[in_offre]
+        scores[:, j] = np.bincount(
+            cv_docs, weights=cv_weights * offre_vector[cv_feats], minlength=n_cvs
+        )
+    return scores
+
+
+class FixedCorpus:
+    """
+    Petit ensemble fixe de documents (scénarios, catégories) vectorisés une seule fois :
+    IDF estimé sur ces documents, poids TF-IDF normalisés rangés dans un index inversé
+    {terme: [(document, poids)]}. `scores` fait le produit scalaire creux d'un texte
+    avec chaque document, sans vecteur de `N_FEATURES` ni recalcul de l'IDF.
+    """
+
+    def __init__(self, documents: Sequence[List[int]]):
+        self.size = len(documents)
+        counts = [Counter(features) for features in documents]
+        df = Counter(term for c in counts for term in c)
+        self._idf = {term: math.log((1.0 + self.size) / (1.0 + n)) + 1.0 for term, n in df.items()}
+        self._idf_unseen = math.log(1.0 + self.size) + 1.0
+        self._postings: Dict[int, List[Tuple[int, float]]] = {}
+        for doc, vector in enumerate(self._vector(c) for c in counts):
+            for term, weight in vector.items():
+                self._postings.setdefault(term, []).append((doc, weight))
+
+    def _vector(self, counts: Dict[int, int]) -> Dict[int, float]:
+        weights = {t: (1.0 + math.log(n)) * self._idf.get(t, self._idf_unseen) for t, n in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {t: w / norm for t, w in weights.items()}
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosinus entre `text` et chaque document, dans l'ordre des documents."""
+        scores = np.zeros(self.size, dtype=np.float64)
+        for term, weight in self._vector(Counter(term_features(text))).items():
+            for doc, doc_weight in self._postings.get(term, ()):
+                scores[doc] += weight * doc_weight
+        return scores
+
+
+def reject_pairs(
+    cvs: Sequence[str],
+    offre_features: Sequence[List[int]],
+    threshold: float = PREFILTER_THRESHOLD,
+    top_k: Optional[int] = PREFILTER_TOP_K,
+) -> Dict[int, float]:
+    """
+    Couples (CV i, offre j) à écarter avant l'appel au modèle, indexés comme la
+    matrice aplatie `i * len(offre_features) + j`, avec leur similarité. Pour chaque offre,
+    seuls les `top_k` CV au-dessus du seuil sont conservés.
+    """
+    if not cvs or not offre_features:
+        return {}
+    scores = similarity_matrix(cvs, offre_features)
+    keep = scores >= threshold
+    if top_k is not None and top_k < len(cvs):
+        # Rang de chaque CV pour chaque offre (0 = le plus proche)
+        ranks = np.argsort(np.argsort(-scores, axis=0, kind="stable"), axis=0)
+        keep &= ranks < top_k
+    rejected = np.flatnonzero(~keep.ravel())
+    return {int(i): float(scores.flat[i]) for i in rejected}
+
+
+def rejection(similarite: float) -> Dict[str, object]:
+    """Résultat renvoyé à la place de l'appel au modèle pour un couple écarté."""
+    return {
+        "score": 0,
+        "evaluation": "Profil écarté par le pré-filtre : domaines trop éloignés de l'offre.",
+        "points_forts": [],
+        "ecarts": [],
+        "prefiltre": True,
+        "similarite": round(similarite, 4),
+    }
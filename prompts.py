@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+import string
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_templates"))
+DATA_SEPARATOR = "=== DONNÉES ==="
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken absent ou encodage indisponible hors ligne
+    _encoding = None
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens (tiktoken si disponible, sinon approximation mots + ponctuation)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+
+# === GABARITS ===
+
+@dataclass
+class PromptTemplate:
+    """
+    Gabarit compilé : la partie fixe (instructions, exemple JSON) est envoyée en
+    premier, en message système identique d'une requête à l'autre, pour profiter
+    du cache de préfixe du fournisseur ; les données de la requête suivent.
+    """
+    name: str
+    static: str
+    dynamic: str
+    version: str
+    fields: List[str]
+    static_tokens: int
+    calls: int = 0
+    dynamic_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def messages(self, **values: Any) -> List[Dict[str, str]]:
+        data = self._format(values)
+        return [
+            {"role": "system", "content": self.static},
+            {"role": "user", "content": data},
+        ]
+
+    def text(self, **values: Any) -> str:
+        """Prompt d'un seul tenant (API d'images) : partie fixe puis données."""
+        return f"{self.static}\n\n{self._format(values)}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "appels": self.calls,
+            "tokens_fixes": self.static_tokens,
+            "tokens_donnees_moyens": self.dynamic_tokens / self.calls if self.calls else 0.0,
+            "tokens_prefixe_cumules": self.static_tokens * self.calls,
+        }
+
+    def _format(self, values: Dict[str, Any]) -> str:
+        data = self.dynamic.format(**values)
+        tokens = count_tokens(data)
+        with self._lock:
+            self.calls += 1
+            self.dynamic_tokens += tokens
+        return data
+
+
+def compile_template(name: str, source: str) -> PromptTemplate:
+    if DATA_SEPARATOR not in source:
+        raise ValueError(f"Gabarit {name} : séparateur « {DATA_SEPARATOR} » manquant")
+    static, dynamic = (part.strip() for part in source.split(DATA_SEPARATOR, 1))
+    fields = sorted({f for _, f, _, _ in string.Formatter().parse(dynamic) if f})
+    return PromptTemplate(
+        name=name,
+        static=static,
+        dynamic=dynamic,
+        version=f"{name}@{hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]}",
+        fields=fields,
+        static_tokens=count_tokens(static),
+    )
+
+
+def load_templates(directory: str = PROMPTS_DIR) -> Dict[str, PromptTemplate]:
+    templates = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                name = filename[:-4]
+                templates[name] = compile_template(name, f.read())
+    return templates
+
+
+TEMPLATES = load_templates()
+
+
+def prompt_stats() -> Dict[str, Any]:
+    return {name: template.stats() for name, template in TEMPLATES.items()}
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Any, Dict, List, Tuple
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "question_bank.db")
+
+TRAITS = ["ouverture", "conscience", "extraversion", "agreabilite", "stabilite"]
+
+
+# === NORMALISATION ===
+
+def _ascii(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def domain_key(poste: str) -> str:
+    """Clé de domaine d'un poste : « Développeur Back-End » -> « developpeur back end »."""
+    return " ".join(re.findall(r"[a-z0-9]+", _ascii(poste)))
+
+
+def difficulty_level(niveau: str) -> str:
+    niveau = niveau.lower().strip()
+    if "aucune" in niveau or "0" in niveau or "1" in niveau:
+        return "facile"
+    elif any(x in niveau for x in ["2", "3", "4"]):
+        return "moyenne"
+    elif any(x in niveau for x in ["5", "6", "7", "8", "9", "10", "plus"]):
+        return "difficile"
+    else:
+        return "moyenne"
+
+
+def trait_key(trait: str) -> str:
+    """Ramène « Agréabilité », « stabilité émotionnelle »… à l'un des `TRAITS` (ou "")."""
+    words = re.findall(r"[a-z]+", _ascii(trait))
+    return next((t for t in TRAITS for w in words if w.startswith(t[:6])), "")
+
+
+def context_hash(question: str) -> str:
+    return hashlib.sha1(" ".join(re.findall(r"[a-z0-9]+", _ascii(question))).encode()).hexdigest()
+
+
+# === BANQUE ===
+
+class QuestionBank:
+    """
+    Banque persistante (SQLite) de questions indexées par variante de test,
+    trait, domaine du poste et difficulté. Un même contexte de question n'est
+    stocké qu'une fois par domaine.
+    """
+
+    def __init__(self, path: str = QUESTION_BANK_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                variante TEXT NOT NULL,
+                trait TEXT NOT NULL,
+                domaine TEXT NOT NULL,
+                difficulte TEXT NOT NULL,
+                contexte TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                UNIQUE (variante, domaine, contexte)
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_questions_lookup "
+            "ON questions (variante, domaine, difficulte, trait)"
+        )
+
+    def add(self, questions: List[Dict[str, Any]], variante: str, domaine: str, difficulte: str) -> int:
+        """Ajoute les questions au trait reconnu ; renvoie le nombre de nouvelles entrées."""
+        rows = []
+        for q in questions:
+            trait = trait_key(str(q.get("trait", "")))
+            if trait:
+                rows.append((
+                    variante, trait, domaine, difficulte,
+                    context_hash(str(q["question"])), json.dumps(q, ensure_ascii=False),
+                ))
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO questions (variante, trait, domaine, difficulte, contexte, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return self._db.total_changes - before
+
+    def sample(
+        self, counts: Dict[str, int], variante: str, domaine: str, difficulte: str
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Tire au hasard `counts[trait]` questions par trait. Renvoie les questions
+        trouvées et, pour chaque trait, le nombre de questions encore manquantes.
+        """
+        questions: List[Dict[str, Any]] = []
+        missing: Dict[str, int] = {}
+        for trait, count in counts.items():
+            rows = self._db.execute(
+                "SELECT payload FROM questions "
+                "WHERE variante = ? AND domaine = ? AND difficulte = ? AND trait = ? "
+                "ORDER BY RANDOM() LIMIT ?",
+                (variante, domaine, difficulte, trait, max(count, 0)),
+            ).fetchall()
+            questions.extend(json.loads(row[0]) for row in rows)
+            missing[trait] = max(count, 0) - len(rows)
+        return questions, missing
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._db.execute(
+            "SELECT variante, trait, COUNT(*) FROM questions GROUP BY variante, trait"
+        ).fetchall()
+        par_variante: Dict[str, Dict[str, int]] = {}
+        for variante, trait, count in rows:
+            par_variante.setdefault(variante, {})[trait] = count
+        return {"total": sum(r[2] for r in rows), "par_variante": par_variante}
@@ -0,0 +1,244 @@
+import logging
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Body, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from cache import cache_key
+from extraction import JsonArrayStream, extract_array, validate_items
+from fastjson import FastJSONResponse, dumps
+from llm import chat_completion, json_format, stream_chat_completion
+from metrics import operation, parsed, phase
+from prompts import TEMPLATES
+from question_bank import QuestionBank, difficulty_level, domain_key, trait_key
+from scheduler import BATCH
+from schemas import (
+    QUESTIONS_SCHEMA,
+    OffreInput,
+    PoidsTraitsInput,
+    QuestionOutput,
+    ScoringBatchRequest,
+    ScoringBatchResponse,
+    ScoringRequest,
+    ScoringResponse,
+    TestResponse,
+)
+from scoring import score_sheets
+from singleflight import SingleFlight
+
+
+# Nouvelles demandes au modèle pour les questions manquantes d'une réponse tronquée
+REGENERATE_ATTEMPTS = int(os.getenv("REGENERATE_ATTEMPTS", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+class Questionnaire:
+    """
+    Génération des tests Big Five d'une version de l'API : gabarit `<variante>_test`,
+    questions de la banque propres à la variante, mélange optionnel des options.
+    """
+
+    def __init__(self, variante: str, shuffle_options: bool = False):
+        self.variante = variante
+        self.shuffle_options = shuffle_options
+        self.template = TEMPLATES[f"{variante}_test"]
+        self.bank = QuestionBank()
+        self.inflight = SingleFlight(f"{variante}_test")
+        self.response_format = json_format("questions", QUESTIONS_SCHEMA)
+
+    def build_prompt(self, offre: OffreInput, poids: PoidsTraitsInput) -> List[Dict[str, str]]:
+        return self.template.messages(**offre.model_dump(), **poids.model_dump())
+
+    def prepare(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.shuffle_options:
+            for q in questions:
+                random.shuffle(q['options'])
+        return questions
+
+    async def generate(self, offre: OffreInput, poids: PoidsTraitsInput) -> Any:
+        operation.set("test")
+        key = cache_key({"offre": offre.model_dump(), "poids": poids.model_dump()}, self.template.version)
+        return await self.inflight.do(key, lambda: self._generate(offre, poids))
+
+    def parse(self, content: str) -> Tuple[List[Dict[str, Any]], List[Any], bool]:
+        """Questions valides récupérées (même d'une réponse tronquée), éléments rejetés, tableau refermé ou non."""
+        with phase("parse"):
+            items, closed = extract_array(content)
+        with phase("validate"):
+            valid, invalid = validate_items(items, QuestionOutput)
+        parsed(closed and not invalid)
+        return [q.model_dump() for q in valid], invalid, closed
+
+    async def _generate(self, offre: OffreInput, poids: PoidsTraitsInput) -> Any:
+        # Questions déjà en banque pour ce domaine et cette difficulté ; le modèle ne comble que les manques
+        domaine = domain_key(offre.poste)
+        difficulte = difficulty_level(offre.niveauExperience)
+        banked, missing = self.bank.sample(poids.model_dump(), self.variante, domaine, difficulte)
+        if not any(missing.values()):
+            return {"questions": self.prepare(banked)}
+
+        generated: List[Dict[str, Any]] = []
+        surplus: List[Dict[str, Any]] = []  # au-delà des poids demandés : banque seulement
+        invalid: List[Any] = []
+        closed = False
+        # Réponse tronquée : on garde les questions complètes et on ne redemande que le reste
+        for _ in range(1 + REGENERATE_ATTEMPTS):
+            prompt = self.build_prompt(offre, PoidsTraitsInput(**missing))
+
+            try:
+                content = await chat_completion(
+                    prompt, max_tokens=3000, temperature=0.7, response_format=self.response_format
+                )
+            except Exception as e:
+                logger.warning("Erreur OpenAI : %s", e)
+                if generated:
+                    break  # les questions déjà récupérées sont gardées et mises en banque
+                raise HTTPException(status_code=500, detail=f"Erreur lors de l'appel à OpenAI: {str(e)}")
+
+            logger.debug("Réponse brute du modèle : %s", content[:500])
+
+            questions, rejected, closed = self.parse(content)
+            invalid += rejected
+            if rejected:
+                logger.warning("Format JSON incorrect : %s", rejected)
+            for q in questions:
+                trait = trait_key(q["trait"])
+                if missing.get(trait, 0) > 0:
+                    missing[trait] -= 1
+                    generated.append(q)
+                else:
+                    surplus.append(q)
+            if not questions or not any(missing.values()):
+                break
+
+        if not generated:
+            if invalid:
+                return JSONResponse(
+                    status_code=400,
+                    content={"error": "Le format des questions n'est pas correct.", "raw": content}
+                )
+            if not closed:
+                logger.warning("Aucun tableau JSON exploitable : %s", content[:500])
+                return JSONResponse(
+                    status_code=502,
+                    content={
+                        "error": "La réponse de l'IA n'est pas un JSON valide.",
+                        "raw": content,
+                        "json_error": "Aucun tableau JSON exploitable dans la réponse.",
+                    }
+                )
+        self.bank.add(generated + surplus, self.variante, domaine, difficulte)
+        return {
+            "questions": self.prepare(banked + generated),
+        }
+
+    def stream(self, offre: OffreInput, poids: PoidsTraitsInput) -> StreamingResponse:
+        prompt = self.build_prompt(offre, poids)
+
+        async def lines():
+            operation.set("test")
+            parser = JsonArrayStream()
+            generated = []
+            rejected = 0
+            try:
+                async for chunk in stream_chat_completion(
+                    prompt, max_tokens=3000, temperature=0.7, response_format=self.response_format
+                ):
+                    for question in parser.feed(chunk):
+                        valid, _ = validate_items([question], QuestionOutput)
+                        if not valid:
+                            rejected += 1
+                            yield dumps({"error": "Le format de la question n'est pas correct.", "raw": question}) + b"\n"
+                            continue
+                        question = valid[0].model_dump()
+                        self.prepare([question])
+                        generated.append(question)
+                        yield dumps(question) + b"\n"
+            except Exception as e:
+                yield dumps({"error": f"Erreur lors de l'appel à OpenAI: {str(e)}"}) + b"\n"
+            parsed(not rejected)
+            self.bank.add(
+                generated, self.variante, domain_key(offre.poste), difficulty_level(offre.niveauExperience)
+            )
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def fill_bank(self, offre: OffreInput, poids: PoidsTraitsInput) -> None:
+        operation.set("test")
+        try:
+            content = await chat_completion(
+                self.build_prompt(offre, poids), max_tokens=3000, temperature=0.7, priority=BATCH,
+                response_format=self.response_format,
+            )
+        except Exception as e:
+            logger.warning("Erreur OpenAI (banque de questions) : %s", e)
+            return
+        questions, _, _ = self.parse(content)
+        added = self.bank.add(
+            questions, self.variante, domain_key(offre.poste), difficulty_level(offre.niveauExperience)
+        )
+        logger.info("Banque de questions : %d nouvelles questions pour « %s »", added, offre.poste)
+
+
+def questionnaire_router(questionnaire: Questionnaire) -> APIRouter:
+    """Routes /generate-test*, /score-test* et /question-bank* d'une version."""
+    router = APIRouter()
+
+    @router.post("/generate-test", response_model=TestResponse, response_class=FastJSONResponse)
+    async def generate_test(
+        offre: OffreInput = Body(...),
+        poids: PoidsTraitsInput = Body(...)
+    ) -> Response:
+        result = await questionnaire.generate(offre, poids)
+        # Questions validées à l'analyse ou à l'entrée en banque : pas de revalidation à la sortie
+        return result if isinstance(result, Response) else FastJSONResponse(result)
+
+    @router.post("/generate-test/stream")
+    async def generate_test_stream(
+        offre: OffreInput = Body(...),
+        poids: PoidsTraitsInput = Body(...)
+    ):
+        """Même test que /generate-test, envoyé en NDJSON question par question."""
+        return questionnaire.stream(offre, poids)
+
+    @router.post("/score-test", response_model=ScoringResponse, response_class=FastJSONResponse)
+    async def score_test(data: ScoringRequest) -> Response:
+        """Profil Big Five (brut, normalisé, pondéré) d'un candidat à partir de ses réponses."""
+        try:
+            result = score_sheets(data.traits, data.poids.model_dump(), [data.reponses])[0]
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        del result["id"], result["rang"]
+        return FastJSONResponse(result)
+
+    @router.post("/score-test/batch", response_model=ScoringBatchResponse, response_class=FastJSONResponse)
+    def score_test_batch(data: ScoringBatchRequest) -> Response:
+        """Profils de tous les candidats, classés par adéquation aux poids de l'offre (calcul hors boucle d'événements)."""
+        try:
+            classement = score_sheets(data.traits, data.poids.model_dump(), data.reponses, data.ids, data.top_k)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return FastJSONResponse({"classement": classement, "total": len(data.reponses)})
+
+    @router.post("/question-bank/fill")
+    async def fill_question_bank(
+        background_tasks: BackgroundTasks,
+        offre: OffreInput = Body(...),
+        poids: PoidsTraitsInput = Body(...)
+    ) -> Dict[str, Any]:
+        """Planifie la génération de questions pour alimenter la banque (domaine de l'offre)."""
+        background_tasks.add_task(questionnaire.fill_bank, offre, poids)
+        return {
+            "status": "planifié",
+            "domaine": domain_key(offre.poste),
+            "difficulte": difficulty_level(offre.niveauExperience),
+        }
+
+    @router.get("/question-bank")
+    async def question_bank_stats() -> Dict[str, Any]:
+        return questionnaire.bank.stats()
+
+    return router
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from cache import cache_key
+from image_jobs import ImageJob, ImageJobs
+from prefilter import FixedCorpus, term_features
+from prompts import TEMPLATES
+
+IMAGE_POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", "3"))  # images à tenir prêtes par scénario
+IMAGE_POOL_MAX_IMAGES = int(os.getenv("IMAGE_POOL_MAX_IMAGES", "200"))  # au-delà : éviction LRU
+IMAGE_POOL_WAIT = float(os.getenv("IMAGE_POOL_WAIT", "120"))  # attente max d'une première image (s)
+
+# Catégories de scènes : (identifiant, mots-clés du domaine / de la situation, scène dessinée)
+SCENARIOS: List[Tuple[str, str, str]] = [
+    ("reunion", "réunion présentation projet chef projet coordination comité planning pilotage",
+     "Personne échangeant calmement en salle de réunion"),
+    ("entraide", "équipe collaboration collègue entraide support accompagnement tutorat mentor",
+     "Personne aidant un collègue à résoudre un problème"),
+    ("concentration", "développeur développement logiciel code programmation python java analyse rédaction",
+     "Personne concentrée seule dans un bureau"),
+    ("client", "client clientèle commercial vente vendeur négociation relation client prospection",
+     "Personne présentant une proposition à un client autour d'une table"),
+    ("accueil", "accueil réception service client standard guichet hôtesse conseiller",
+     "Personne accueillant un visiteur avec le sourire à un comptoir"),
+    ("management", "manager management responsable directeur encadrement leadership direction",
+     "Personne animant un point d'équipe debout devant un tableau"),
+    ("incident", "incident urgence crise astreinte production panne sécurité support niveau",
+     "Personne gérant calmement une situation urgente devant plusieurs écrans"),
+    ("atelier", "atelier usine production industrielle opérateur machine fabrication technicien",
+     "Personne réglant une machine dans un atelier lumineux"),
+    ("chantier", "chantier bâtiment btp construction travaux terrain conducteur génie civil",
+     "Personne portant un casque consultant un plan sur un chantier"),
+    ("soins", "santé soins infirmier infirmière médecin patient hôpital clinique aide soignant",
+     "Personne en blouse écoutant un patient avec attention"),
+    ("laboratoire", "laboratoire recherche chercheur scientifique chimie biologie expérience essais",
+     "Personne en blouse réalisant une expérience au laboratoire"),
+    ("enseignement", "enseignant formateur formation professeur pédagogie cours apprentissage école",
+     "Personne expliquant un schéma à un petit groupe"),
+    ("logistique", "logistique entrepôt stock transport livraison supply chain magasinier préparateur",
+     "Personne organisant des colis dans un entrepôt"),
+    ("creation", "design designer graphiste créatif création ux ui maquette artistique",
+     "Personne dessinant des maquettes sur un grand écran"),
+    ("communication", "marketing communication réseaux sociaux contenu campagne marque événementiel",
+     "Personne préparant une campagne avec des affiches colorées"),
+    ("finance", "comptable comptabilité finance financier audit contrôle gestion budget fiscalité",
+     "Personne analysant des graphiques financiers à son bureau"),
+    ("juridique", "juridique juriste avocat droit contrat conformité réglementation",
+     "Personne relisant un contrat avec soin"),
+    ("rh", "ressources humaines rh recrutement recruteur entretien paie talent",
+     "Personne menant un entretien bienveillant face à un candidat"),
+    ("maintenance", "maintenance ingénieur ingénierie réseau systèmes infrastructure électricien mécanique",
+     "Personne réparant un équipement technique avec méthode"),
+    ("restauration", "restauration cuisine cuisinier serveur hôtellerie hôtel chef restaurant",
+     "Personne dressant une assiette dans une cuisine professionnelle"),
+    ("teletravail", "télétravail remote distance visioconférence freelance indépendant",
+     "Personne en visioconférence depuis un espace de travail calme"),
+]
+
+
+class ScenarioPool:
+    """
+    Images de /generate-image-question par scénario : le couple (CV, offre) est
+    ramené à l'une des `SCENARIOS` (similarité du pré-filtre), et chaque scénario
+    dispose d'un petit stock d'images pré-générées.
+
+    Une image n'est générée que si le stock du scénario compte moins de `size`
+    images ; au-delà de `max_images` images au total, la moins récemment servie
+    est évincée. Le stock est conservé dans `pools.json` à côté des images.
+    """
+
+    def __init__(self, jobs: ImageJobs, size: int = IMAGE_POOL_SIZE, max_images: int = IMAGE_POOL_MAX_IMAGES):
+        self.jobs = jobs
+        self.size = size
+        self.max_images = max_images
+        self.template = TEMPLATES["main_scenario"]
+        self._corpus = FixedCorpus([term_features(keywords) for _, keywords, _ in SCENARIOS])
+        self._path = os.path.join(jobs.store.directory, "pools.json")
+        # (scénario, image) du moins au plus récemment servi
+        self._lru: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._pending: Dict[str, List[ImageJob]] = {}
+        self._variants: Dict[str, int] = {}  # tirages déjà demandés par scénario
+        self.served = 0
+        self.generated = 0
+        self.evicted = 0
+
+        if os.path.exists(self._path):
+            with open(self._path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self._variants = saved["variantes"]
+            for scenario, names in saved["stocks"].items():
+                for name in names:
+                    if jobs.store.path(name):
+                        self._lru[(scenario, name)] = None
+
+    def categorize(self, cv: str, offre: str) -> Tuple[str, str]:
+        """Scénario (identifiant, scène) le plus proche du couple ; le premier en cas d'égalité."""
+        scores = self._corpus.scores(f"{offre} {cv}")
+        scenario_id, _, scene = SCENARIOS[int(scores.argmax())]
+        return scenario_id, scene
+
+    def prompt(self, cv: str, offre: str) -> str:
+        """Prompt d'image du scénario du couple : ni le CV ni l'offre n'y figurent."""
+        return self.template.text(scene=self.categorize(cv, offre)[1])
+
+    def pool(self, scenario_id: str) -> List[str]:
+        return [name for (scenario, name) in self._lru if scenario == scenario_id]
+
+    async def image(self, cv: str, offre: str) -> Dict[str, Any]:
+        scenario_id, scene = self.categorize(cv, offre)
+        prompt = self.template.text(scene=scene)
+        self._top_up(scenario_id, prompt)
+
+        pool = sorted(self.pool(scenario_id))
+        if not pool:
+            # Stock vide : on attend la première image du scénario
+            pending = self._pending.get(scenario_id, [])
+            if pending:
+                self._add(scenario_id, await self.jobs.wait(pending[0], IMAGE_POOL_WAIT))
+            pool = sorted(self.pool(scenario_id))
+            if not pool:
+                erreur = pending[0].erreur if pending and pending[0].erreur else "Image pas encore disponible."
+                raise RuntimeError(erreur)
+
+        # Même candidat et même stock : même image
+        name = pool[int(cache_key({"cv": cv, "offre": offre}, "scenario")[:8], 16) % len(pool)]
+        self._lru.move_to_end((scenario_id, name))
+        self.served += 1
+        return {"scenario": scenario_id, "image": name, "description_auto": prompt}
+
+    def _top_up(self, scenario_id: str, prompt: str) -> None:
+        pending = [job for job in self._pending.get(scenario_id, []) if not job.done.is_set()]
+        missing = self.size - len(self.pool(scenario_id)) - len(pending)
+        for _ in range(max(missing, 0)):
+            # Nouveau tirage à chaque fois : une image évincée n'est pas resservie depuis le magasin
+            variant = self._variants.get(scenario_id, 0)
+            self._variants[scenario_id] = variant + 1
+            job = self.jobs.submit(prompt, variant=variant)
+            pending.append(job)
+            asyncio.ensure_future(self._collect(scenario_id, job))
+        self._pending[scenario_id] = pending
+
+    async def _collect(self, scenario_id: str, job: ImageJob) -> None:
+        await job.done.wait()
+        self._add(scenario_id, job)
+
+    def _add(self, scenario_id: str, job: ImageJob) -> None:
+        if job.image is None or (scenario_id, job.image) in self._lru:
+            return
+        self._lru[(scenario_id, job.image)] = None
+        self.generated += 1
+        while len(self._lru) > self.max_images:
+            (_, name), _ = self._lru.popitem(last=False)
+            if not any(other == name for _, other in self._lru):
+                self.jobs.store.delete(name)
+            self.evicted += 1
+        self._save()
+
+    def _save(self) -> None:
+        pools: Dict[str, List[str]] = {}
+        for scenario, name in self._lru:
+            pools.setdefault(scenario, []).append(name)
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stocks": pools, "variantes": self._variants}, f)
+        os.replace(tmp, self._path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scenarios": {s: len(self.pool(s)) for s, _, _ in SCENARIOS},
+            "images": len(self._lru),
+            "taille_stock": self.size,
+            "max_images": self.max_images,
+            "servies": self.served,
+            "generees": self.generated,
+            "evincees": self.evicted,
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import openai
+
+from metrics import PHASE_SECONDS, Gauge, operation
+
+# Priorités (la plus petite passe en premier)
+INTERACTIVE = 0
+BATCH = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Erreurs amont transitoires, rejouées avec attente
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Instances nommées, exposées par GET /scheduler
+REGISTRY: Dict[str, "LLMScheduler"] = {}
+
+
+class _Bucket:
+    """Seau à jetons : `capacity` par minute, rechargé en continu ; 0 : sans limite."""
+
+    def __init__(self, per_minute: float):
+        self.unlimited = per_minute <= 0
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self, amount: float) -> float:
+        """Secondes à attendre avant de pouvoir prélever `amount` (0 si disponible)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future", "enqueued")
+
+    def __init__(self, priority: int, seq: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """
+    Ordonnanceur des appels amont :
+    - budgets requêtes/minute et tokens/minute (tokens estimés : prompt + `max_tokens`),
+      0 : sans limite,
+    - files par priorité (interactif avant batch, FIFO à priorité égale),
+    - concurrence adaptative AIMD : part de `initial_concurrency` (par défaut
+      `max_concurrency`), +1/limite par succès, ×0,5 sur 429, ×0,9 si la latence
+      dépasse la cible,
+    - nouvelles tentatives avec attente exponentielle « full jitter » (ou `Retry-After`).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_concurrency: int = 512,
+        initial_concurrency: Optional[int] = None,
+        target_latency: float = 60.0,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Pas de démarrage lent : seuls les 429 et la latence font baisser la limite
+        self.limit = float(min(initial_concurrency or max_concurrency, max_concurrency))
+
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.completed = 0
+        self.throttled = 0
+        self.retries = 0
+        self._waits = {p: [0, 0.0, 0.0] for p in PRIORITY_NAMES}  # nombre, total, max
+        REGISTRY[name] = self
+
+    # --- admission ---
+
+    async def acquire(self, tokens: int, priority: int = INTERACTIVE) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), tokens, loop.create_future())
+        heapq.heappush(self._queue, waiter)
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(0.0)  # place accordée pendant l'annulation : on la rend
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        PHASE_SECONDS.observe((operation.get(), "queue"), waited)
+        stats = self._waits[priority]
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+
+    def release(self, latency: float, throttled: bool = False) -> None:
+        self._inflight -= 1
+        if throttled:
+            self.limit = max(1.0, self.limit * 0.5)
+        elif latency > self.target_latency:
+            self.limit = max(1.0, self.limit * 0.9)
+        elif latency > 0:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+        self._pump()
+
+    def _pump(self) -> None:
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():  # annulé pendant l'attente
+                heapq.heappop(self._queue)
+                continue
+            if self._inflight >= int(self.limit):
+                return
+            delay = max(self._requests.wait(1), self._tokens.wait(head.tokens))
+            if delay > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(head.tokens)
+            self._inflight += 1
+            head.future.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._pump()
+
+    # --- exécution ---
+
+    async def open(self, fn: Callable[[], Awaitable[Any]], tokens: int, priority: int = INTERACTIVE) -> Tuple[Any, float]:
+        """
+        Attend une place dans le budget et exécute `fn`, en rejouant les erreurs
+        transitoires. La place reste prise : l'appelant la rend avec `finish(start)`.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(tokens, priority)
+            start = time.monotonic()
+            try:
+                return await fn(), start
+            except RETRYABLE_ERRORS as e:
+                throttled = isinstance(e, openai.RateLimitError)
+                self.throttled += throttled
+                self.release(time.monotonic() - start, throttled)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+            except BaseException:
+                self.release(time.monotonic() - start)
+                raise
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def finish(self, start: float) -> None:
+        latency = time.monotonic() - start
+        PHASE_SECONDS.observe((operation.get(), "upstream"), latency)
+        self.completed += 1
+        self.release(latency)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], tokens: int, priority: int = INTERACTIVE) -> Any:
+        """Exécute `fn` dans le budget et rend la place aussitôt."""
+        result, start = await self.open(fn, tokens, priority)
+        self.finish(start)
+        return result
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        pending = [w for w in self._queue if not w.future.done()]
+        return {
+            "file": len(pending),
+            "file_par_priorite": {
+                name: sum(1 for w in pending if w.priority == p) for p, name in PRIORITY_NAMES.items()
+            },
+            "en_cours": self._inflight,
+            "concurrence_max": int(self.limit),
+            "appels": self.completed,
+            "erreurs_429": self.throttled,
+            "nouvelles_tentatives": self.retries,
+            "attente": {
+                PRIORITY_NAMES[p]: {
+                    "moyenne_s": total / count if count else 0.0,
+                    "max_s": longest,
+                }
+                for p, (count, total, longest) in self._waits.items()
+            },
+        }
+
+
+def scheduler_from_env(prefix: str) -> LLMScheduler:
+    """
+    Ordonnanceur configuré par `<PREFIX>_RPM`, `_TPM` (quotas du compte ; sans limite
+    par défaut), `_MAX_CONCURRENCY`, `_INITIAL_CONCURRENCY`, `_TARGET_LATENCY`, `_MAX_RETRIES`.
+    """
+    initial = os.getenv(f"{prefix}_INITIAL_CONCURRENCY")
+    return LLMScheduler(
+        name=prefix.lower(),
+        rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+        tpm=float(os.getenv(f"{prefix}_TPM", "0")),
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "512")),
+        initial_concurrency=int(initial) if initial else None,
+        target_latency=float(os.getenv(f"{prefix}_TARGET_LATENCY", "60")),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", "4")),
+    )
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    return {name: scheduler.stats() for name, scheduler in REGISTRY.items()}
+
+
+def _gauge(key: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(name,): scheduler.stats()[key] for name, scheduler in REGISTRY.items()}
+
+
+Gauge("llm_scheduler_queue_depth", "Appels en attente dans l'ordonnanceur", ("scheduler",), _gauge("file"))
+Gauge("llm_scheduler_inflight", "Appels amont en cours", ("scheduler",), _gauge("en_cours"))
+Gauge("llm_scheduler_concurrency_limit", "Concurrence autorisée (AIMD)", ("scheduler",), _gauge("concurrence_max"))
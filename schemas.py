@@ -0,0 +1,178 @@
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from batch import BATCH_DEFAULT_CONCURRENCY
+from prefilter import PREFILTER_THRESHOLD, PREFILTER_TOP_K
+from question_bank import TRAITS
+
+
+# === TESTS DE PERSONNALITÉ ===
+
+class OffreInput(BaseModel):
+    poste: str
+    description: str
+    typeTravail: str
+    niveauExperience: str
+    responsabilite: str
+    experience: str
+
+class PoidsTraitsInput(BaseModel):
+    ouverture: int
+    conscience: int
+    extraversion: int
+    agreabilite: int
+    stabilite: int
+
+
+# === CORRECTION DES TESTS ===
+
+class ScoringRequest(BaseModel):
+    """Réponses d'un candidat : score (1-5) de l'option choisie à chaque question, null si sans réponse."""
+    traits: List[str]  # trait de chaque question, dans l'ordre du test
+    poids: PoidsTraitsInput
+    reponses: List[Optional[int]]
+
+class ScoringBatchRequest(BaseModel):
+    """Matrice de réponses : une ligne par candidat, une colonne par question de `traits`."""
+    traits: List[str]
+    poids: PoidsTraitsInput
+    reponses: List[List[Optional[int]]]
+    ids: Optional[List[str]] = None
+    top_k: Optional[int] = Field(None, ge=1)  # nombre de candidats renvoyés, les mieux classés
+
+
+# === MATCHING ===
+
+class MatchingBatchOptions(BaseModel):
+    """Champs communs des requêtes de matching par lot ; chaque version y ajoute son modèle d'offre."""
+    cvs: List[str]
+    offre_ids: List[str] = []
+    concurrence: int = BATCH_DEFAULT_CONCURRENCY
+    timeout: float = 60.0
+    stream: bool = False
+    seuil: float = PREFILTER_THRESHOLD
+    top_k: Optional[int] = PREFILTER_TOP_K
+
+
+# === RÉPONSES DU MODÈLE ===
+
+class OptionOutput(BaseModel):
+    text: str
+    score: int = Field(ge=1, le=5)
+
+class QuestionOutput(BaseModel):
+    trait: str
+    question: str
+    options: List[OptionOutput] = Field(min_length=2)
+
+class MatchResult(BaseModel):
+    score: int = Field(ge=0, le=100)
+    evaluation: str
+    points_forts: List[str] = []
+    ecarts: List[str] = []
+
+class PersonalityOutput(BaseModel):
+    id: int
+    analyse: str
+
+
+# === RÉPONSES DES ROUTES ===
+
+class TestResponse(BaseModel):
+    questions: List[QuestionOutput]
+
+class TraitScore(BaseModel):
+    brut: int
+    reponses: int
+    profil: Optional[float]  # null si aucune réponse sur le trait
+    pondere: Optional[float]
+
+class ScoringResponse(BaseModel):
+    adequation: Optional[float]
+    traits: Dict[str, TraitScore]
+
+class RankedScoring(ScoringResponse):
+    id: Union[str, int]
+    rang: int
+
+class ScoringBatchResponse(BaseModel):
+    classement: List[RankedScoring]
+    total: int
+
+class MatchResponse(BaseModel):
+    """Résultat de /match-cv-offre ; en cas d'échec, seuls `error` (et `raw`) sont présents."""
+    score: Optional[int] = None
+    evaluation: Optional[str] = None
+    points_forts: List[str] = []
+    ecarts: List[str] = []
+    modele: Optional[str] = None  # modèle retenu par la cascade
+    cv_tokens: Optional[Dict[str, int]] = None
+    reutilise: Optional[bool] = None  # résultat d'un CV quasi identique
+    similarite_cv: Optional[float] = None
+    error: Optional[str] = None
+    raw: Optional[str] = None
+
+
+# Schémas de sortie stricts envoyés au modèle (response_format) : clés courtes,
+# aucune propriété optionnelle, les questions sont enveloppées dans un objet
+QUESTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "trait": {"type": "string", "enum": TRAITS},
+                    "question": {"type": "string"},
+                    "options": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "text": {"type": "string"},
+                                "score": {"type": "integer", "enum": [1, 2, 3, 4, 5]},
+                            },
+                            "required": ["text", "score"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["trait", "question", "options"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["questions"],
+    "additionalProperties": False,
+}
+
+MATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "evaluation": {"type": "string"},
+        "points_forts": {"type": "array", "items": {"type": "string"}},
+        "ecarts": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "evaluation", "points_forts", "ecarts"],
+    "additionalProperties": False,
+}
+
+PERSONALITY_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analyses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "integer"}, "analyse": {"type": "string"}},
+                "required": ["id", "analyse"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["analyses"],
+    "additionalProperties": False,
+}
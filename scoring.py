@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from question_bank import TRAITS, trait_key
+
+MAX_SCORE = 5  # options notées de 1 à 5 ; 0 = question sans réponse
+
+
+# === MATRICES ===
+
+def trait_indices(traits: Sequence[str]) -> np.ndarray:
+    """Indice dans `TRAITS` du trait de chaque question (« Agréabilité » -> 3)."""
+    keys = [trait_key(t) for t in traits]
+    unknown = [t for t, k in zip(traits, keys) if not k]
+    if unknown:
+        raise ValueError(f"Traits inconnus : {', '.join(unknown)}")
+    return np.array([TRAITS.index(k) for k in keys], dtype=np.intp)
+
+
+def answer_matrix(sheets: Sequence[Sequence[Optional[int]]], questions: int) -> np.ndarray:
+    """Matrice candidats × questions (int8) des scores choisis ; None devient 0."""
+    if any(len(sheet) != questions for sheet in sheets):
+        raise ValueError(f"Chaque candidat doit avoir {questions} réponses (une par question).")
+    out_of_range = ValueError(f"Les scores doivent être compris entre 1 et {MAX_SCORE}.")
+    try:
+        answers = np.array(
+            [[0 if score is None else score for score in sheet] for sheet in sheets], dtype=np.int64
+        ).reshape(len(sheets), questions)
+    except OverflowError:
+        raise out_of_range from None
+    # 0 est réservé aux questions sans réponse : un 0 explicite est refusé comme tout score hors bornes
+    explicit_zeros = np.count_nonzero(answers == 0) - sum(sheet.count(None) for sheet in sheets)
+    if answers.size and (answers.min() < 0 or answers.max() > MAX_SCORE or explicit_zeros):
+        raise out_of_range
+    return answers.astype(np.int8)
+
+
+def weight_vector(poids: Dict[str, int]) -> np.ndarray:
+    return np.array([poids[t] for t in TRAITS], dtype=np.float32)
+
+
+# === CORRECTION ===
+
+def score_matrix(answers: np.ndarray, traits: np.ndarray, weights: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Profils Big Five de tous les candidats en quelques produits matriciels :
+    - `brut` : somme des scores par trait, `reponses` : questions répondues par trait,
+    - `profil` : moyenne ramenée sur 0-100 (NaN si aucune réponse sur le trait),
+    - `pondere` : profil × poids du trait,
+    - `adequation` : moyenne pondérée des profils (traits répondus seulement),
+    - `rang` : classement par adéquation décroissante (1 = meilleur, NaN en dernier).
+    """
+    one_hot = np.zeros((answers.shape[1], len(TRAITS)), dtype=np.float32)
+    one_hot[np.arange(answers.shape[1]), traits] = 1.0
+
+    raw = answers.astype(np.float32) @ one_hot
+    counts = (answers > 0).astype(np.float32) @ one_hot
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile = (raw / counts - 1.0) / (MAX_SCORE - 1) * 100.0
+        weighted = profile * weights
+        fit = np.nansum(weighted, axis=1) / ((counts > 0) @ weights)
+    fit[~np.isfinite(fit)] = np.nan
+
+    order = np.argsort(np.where(np.isnan(fit), np.inf, -fit), kind="stable")
+    ranks = np.empty(len(fit), dtype=np.int64)
+    ranks[order] = np.arange(1, len(fit) + 1)
+    return {
+        "brut": raw,
+        "reponses": counts,
+        "profil": profile,
+        "pondere": weighted,
+        "adequation": fit,
+        "rang": ranks,
+    }
+
+
+def _column(values: np.ndarray) -> List[Any]:
+    """Arrondi vectorisé puis listes Python ; NaN devient None."""
+    rounded = np.round(values.astype(np.float64), 2).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def profiles(
+    scores: Dict[str, np.ndarray], ids: Optional[Sequence[str]] = None, top_k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Résultats JSON triés par rang (les `top_k` premiers si précisé)."""
+    order = np.argsort(scores["rang"])[:top_k]
+    raw = scores["brut"][order].astype(np.int64).tolist()
+    counts = scores["reponses"][order].astype(np.int64).tolist()
+    profile = _column(scores["profil"][order])
+    weighted = _column(scores["pondere"][order])
+    fit = _column(scores["adequation"][order])
+    keys = order.tolist() if ids is None else [ids[i] for i in order.tolist()]
+    return [
+        {
+            "id": key,
+            "rang": rank,
+            "adequation": fit[row],
+            "traits": {
+                trait: {"brut": b, "reponses": c, "profil": p, "pondere": w}
+                for trait, b, c, p, w in zip(TRAITS, raw[row], counts[row], profile[row], weighted[row])
+            },
+        }
+        for row, (rank, key) in enumerate(zip(range(1, len(keys) + 1), keys))
+    ]
+
+
+def score_sheets(
+    traits: Sequence[str],
+    poids: Dict[str, int],
+    sheets: Sequence[Sequence[Optional[int]]],
+    ids: Optional[Sequence[str]] = None,
+    top_k: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Correction complète : listes de réponses -> profils classés. ValueError si l'entrée est incohérente."""
+    if ids is not None and len(ids) != len(sheets):
+        raise ValueError("`ids` doit avoir autant d'éléments que `reponses`.")
+    scores = score_matrix(answer_matrix(sheets, len(traits)), trait_indices(traits), weight_vector(poids))
+    return profiles(scores, ids, top_k)
@@ -0,0 +1,84 @@
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from compaction import compact_cv
+from llm import close_clients
+from metrics import CV_TOKENS, ROUTE_PREFIX_KEY, MetricsMiddleware, render
+from prompts import prompt_stats
+from scheduler import scheduler_stats
+from singleflight import single_flight_stats
+
+# Routes communes à toutes les versions
+shared_router = APIRouter()
+
+
+@shared_router.get("/prompts")
+async def prompts_stats() -> Dict[str, Any]:
+    """Versions des gabarits et tokens de prompt par route."""
+    return prompt_stats()
+
+
+@shared_router.get("/single-flight")
+async def single_flight() -> Dict[str, Any]:
+    """Appels amont lancés et requêtes identiques fusionnées, par route."""
+    return single_flight_stats()
+
+
+@shared_router.get("/scheduler")
+async def scheduler() -> Dict[str, Any]:
+    """Files d'attente, concurrence adaptative, 429 et temps d'attente de l'ordonnanceur amont."""
+    return scheduler_stats()
+
+
+@shared_router.get("/cv-compaction")
+async def cv_compaction() -> Dict[str, Any]:
+    """Tokens des CV avant et après compaction, par route, et cache des CV compactés."""
+    routes: Dict[str, Dict[str, float]] = {}
+    for route in sorted({labels[0] for labels in CV_TOKENS.series()}):
+        before, after = CV_TOKENS.get((route, "avant")), CV_TOKENS.get((route, "apres"))
+        routes[route] = {"tokens_avant": before, "tokens_apres": after, "tokens_economises": before - after}
+    return {"routes": routes, "cache": compact_cv.stats()}
+
+
+@shared_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Latences par route et par phase, tokens, échecs d'analyse et caches, au format Prometheus."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_clients()
+
+
+def _route_prefix(prefix: str) -> Callable[[Request], Awaitable[None]]:
+    """Dépendance qui note le préfixe du routeur dans le scope, pour les métriques par route."""
+
+    async def note(request: Request) -> None:
+        request.scope[ROUTE_PREFIX_KEY] = prefix
+
+    return note
+
+
+def create_app(routers: Dict[str, APIRouter]) -> FastAPI:
+    """Application FastAPI (CORS, routes communes) montant chaque routeur sous son préfixe."""
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(MetricsMiddleware)
+
+    for prefix, router in routers.items():
+        app.include_router(router, prefix=prefix, dependencies=[Depends(_route_prefix(prefix))])
+    app.include_router(shared_router)
+    return app
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# Instances nommées, exposées par GET /single-flight
+REGISTRY: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """
+    Fusion des appels identiques en cours : tant qu'un appel pour une clé n'est pas
+    terminé, les demandes suivantes pour la même clé attendent son résultat au lieu
+    de relancer le modèle.
+
+    L'appel tourne dans sa propre tâche : si le client qui l'a déclenché se
+    déconnecte, les autres demandeurs reçoivent quand même la réponse.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        REGISTRY[name] = self
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.coalesced
+        return {
+            "appels": self.calls,
+            "fusionnes": self.coalesced,
+            "en_cours": len(self._inflight),
+            "taux_fusion": self.coalesced / total if total else 0.0,
+        }
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    return {name: flight.stats() for name, flight in REGISTRY.items()}
@@ -0,0 +1,154 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+# Backend local sans réseau (LLM_BACKEND=stub) : réponses déterministes par prompt,
+# latence simulée. Sert aux tests de charge et aux benchmarks du service lui-même.
+
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.2"))  # latence moyenne d'un appel (s)
+STUB_LATENCY_DIST = os.getenv("STUB_LATENCY_DIST", "fixe")  # fixe, exponentielle ou lognormale
+STUB_TOKEN_LATENCY = float(os.getenv("STUB_TOKEN_LATENCY", "0"))  # par token de sortie (s)
+
+TRAITS = ["ouverture", "conscience", "extraversion", "agreabilite", "stabilite"]
+
+# Découpage approximatif d'un tokenizer BPE : mots, ponctuation et blocs d'espaces
+_BPE_RE = re.compile(r"\w+|[^\w\s]|\s+")
+
+# PNG 1×1 renvoyé en URL data: à la place des URL temporaires du fournisseur
+FAKE_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+)
+FAKE_IMAGE_URL = "data:image/png;base64," + base64.b64encode(FAKE_PNG).decode()
+
+FAKE_ANALYSIS = (
+    "Profil analytique et posé, orienté collaboration : le candidat privilégie l'écoute "
+    "et la recherche de solutions concrètes face aux tensions."
+)
+
+_STRENGTHS = ["Expérience similaire", "Maîtrise des outils demandés", "Formation adaptée", "Mobilité géographique"]
+_GAPS = ["Certification manquante", "Expérience managériale limitée", "Secteur différent", "Niveau d'anglais non précisé"]
+
+
+class Usage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def count_tokens(text: str) -> int:
+    return len(_BPE_RE.findall(text))
+
+
+# === RÉPONSES SIMULÉES ===
+
+def fake_questions(rng: random.Random, per_trait: int = 3) -> List[Dict[str, Any]]:
+    return [
+        {
+            "trait": trait,
+            "question": f"Question de mise en situation n°{i + 1}",
+            "options": [{"text": f"Réponse {score}", "score": score} for score in sorted(rng.sample(range(1, 6), 4))],
+        }
+        for i, trait in enumerate(TRAITS * per_trait)
+    ]
+
+
+def fake_match(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "score": rng.randint(20, 95),
+        "evaluation": "Profil cohérent avec le poste.",
+        "points_forts": rng.sample(_STRENGTHS, 2),
+        "ecarts": rng.sample(_GAPS, 1),
+    }
+
+
+def fake_content(
+    messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]], seed: int = 0, model: str = ""
+) -> str:
+    """
+    Réponse simulée, toujours la même pour un même prompt, un même modèle et une
+    même graine. En texte libre, JSON indenté entre balises (comme observé en
+    production) ; avec `response_format`, JSON compact et questions enveloppées.
+    """
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    rng = random.Random(f"{seed}:{model}:{prompt}")
+    if "Descriptions rédigées par les candidats" in prompt:
+        ids = [int(i) for i in re.findall(r"^\[(\d+)\]", prompt, flags=re.MULTILINE)]
+        return json.dumps({"analyses": [{"id": i, "analyse": FAKE_ANALYSIS} for i in ids]}, ensure_ascii=False)
+    if "a décrit une image" in prompt:
+        return FAKE_ANALYSIS
+    questions = "Big Five" in prompt
+    if response_format:
+        value = {"questions": fake_questions(rng)} if questions else fake_match(rng)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    value = fake_questions(rng) if questions else fake_match(rng)
+    return "```json\n" + json.dumps(value, ensure_ascii=False, indent=4) + "\n```"
+
+
+# === BACKEND ===
+
+class StubBackend:
+    """Même interface que `OpenAIBackend` (llm.py), sans appel réseau."""
+
+    name = "stub"
+
+    def __init__(
+        self,
+        seed: int = STUB_SEED,
+        latency: float = STUB_LATENCY,
+        distribution: str = STUB_LATENCY_DIST,
+        token_latency: float = STUB_TOKEN_LATENCY,
+        model_latency: Optional[Dict[str, float]] = None,
+    ):
+        """`model_latency` remplace `latency` pour certains modèles (cascade rapide / principal)."""
+        if distribution not in ("fixe", "exponentielle", "lognormale"):
+            raise ValueError(f"STUB_LATENCY_DIST inconnue : {distribution}")
+        self.seed = seed
+        self.latency = latency
+        self.distribution = distribution
+        self.token_latency = token_latency
+        self.model_latency = model_latency or {}
+        self._rng = random.Random(seed)
+
+    def _delay(self, model: str = "") -> float:
+        latency = self.model_latency.get(model, self.latency)
+        if latency <= 0 or self.distribution == "fixe":
+            return max(latency, 0.0)
+        if self.distribution == "exponentielle":
+            return self._rng.expovariate(1 / latency)
+        # Lognormale de moyenne `latency` (sigma 0,5 : queue longue modérée)
+        return self._rng.lognormvariate(0, 0.5) * latency / 1.1331
+
+    def _answer(self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]) -> Tuple[str, Usage]:
+        content = fake_content(messages, kwargs.get("response_format"), self.seed, model)
+        usage = Usage(sum(count_tokens(m.get("content", "")) for m in messages), count_tokens(content))
+        return content, usage
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int, **kwargs) -> Tuple[str, Any]:
+        content, usage = self._answer(messages, model, kwargs)
+        await asyncio.sleep(self._delay(model) + self.token_latency * usage.completion_tokens)
+        return content, usage
+
+    async def stream(
+        self, messages: List[Dict[str, str]], model: str, max_tokens: int, **kwargs
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        content, usage = self._answer(messages, model, kwargs)
+        await asyncio.sleep(self._delay(model))
+
+        async def chunks():
+            for start in range(0, len(content), 16):
+                piece = content[start:start + 16]
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency * count_tokens(piece))
+                yield piece, None
+            yield "", usage
+
+        return chunks()
+
+    async def image(self, prompt: str, size: str) -> str:
+        await asyncio.sleep(self._delay())
+        return FAKE_IMAGE_URL
@@ -0,0 +1,44 @@
+from compaction import compact, sections
+
+REVIEW_CV = (
+    "John Doe\nContact\njohn@x.com\nWork History\nSenior Python developer at Acme 2018-2023\n"
+    "Built APIs with FastAPI\nSkills\nPython, SQL"
+)
+
+
+def test_known_heading_after_contact_keeps_experience():
+    text = compact(REVIEW_CV, 1500)
+    assert "Senior Python developer at Acme 2018-2023" in text
+    assert "Built APIs with FastAPI" in text
+    assert "john@x.com" not in text
+
+
+def test_unknown_heading_closes_dropped_section():
+    found = sections("Paul\nLoisirs\nFootball, lecture\nMISSIONS FREELANCE\nAudit sécurité pour Baz 2022")
+    assert found["interets"][1] == ["Football, lecture"]
+    assert found["MISSIONS FREELANCE"][1] == ["Audit sécurité pour Baz 2022"]
+
+
+def test_internships_after_references_are_kept():
+    cv = "Jeanne Martin\nExpérience\nDéveloppeuse chez Foo 2021-2024\nRéférences\nSur demande\nStages\nStage chez Bar 2020"
+    assert "Stage chez Bar 2020" in compact(cv, 1500)
+
+
+def test_optional_sections_dropped_only_over_budget():
+    cv = "Paul\nCompétences\nPentest\nLoisirs\nFootball, lecture"
+    assert "Football, lecture" in compact(cv, 1500)
+    tight = compact(cv, 12)
+    assert "Football" not in tight and "Pentest" in tight
+
+
+def test_licence_and_nationality_are_kept():
+    cv = (
+        "Marc Dupont\nné le 3 mars 1980\nAdresse : 3 rue X, Lyon\nNationalité française\n"
+        "Expérience\nChauffeur PL chez Trans 2010-2024\nPermis C et CE valides\n"
+        "Informations personnelles\nPermis B\nSituation familiale : marié"
+    )
+    text = compact(cv, 1500)
+    assert "Permis C et CE valides" in text and "Nationalité française" in text
+    assert "né le" not in text and "Adresse" not in text
+    # Rubrique retirable hors budget : le permis est gardé dans l'en-tête
+    assert "Permis B" in compact(cv, 20)
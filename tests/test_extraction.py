@@ -0,0 +1,21 @@
+import pytest
+
+from extraction import extract_json
+
+
+def test_unbalanced_bracket_in_prose_is_skipped():
+    assert extract_json('Note [1 : voir ci-dessous.\n{"score": 80, "points_forts": []}') == {
+        "score": 80, "points_forts": [],
+    }
+    assert extract_json("Voir [réf.\n```json\n[1, 2]\n```") == [1, 2]
+
+
+@pytest.mark.parametrize("text", ['{"a": {"b": 1}, "c": ', '{"a": "abc', '```json\n[{"x": 1}, {"y"\n```'])
+def test_truncated_value_is_reported_not_its_fragments(text):
+    with pytest.raises(ValueError, match="tronquée"):
+        extract_json(text)
+
+
+def test_prose_without_json():
+    with pytest.raises(ValueError, match="Aucune valeur"):
+        extract_json("Note [1 : pas de JSON ici")
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# Application complète avec le backend local et un état jetable (banque, offres, images)
+_state = tempfile.mkdtemp(prefix="tests-")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("QUESTION_BANK_PATH", os.path.join(_state, "question_bank.db"))
+os.environ.setdefault("OFFRE_INDEX_DIR", os.path.join(_state, "offres"))
+os.environ.setdefault("IMAGE_STORE_DIR", os.path.join(_state, "images"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app  # noqa: E402
+from metrics import render  # noqa: E402
+
+
+def series(text: str, route: str, status: str) -> bool:
+    return any(
+        line.startswith("http_request_duration_seconds_count{") and f'route="{route}"' in line
+        and f'status="{status}"' in line
+        for line in text.splitlines()
+    )
+
+
+def test_request_duration_is_labelled_with_the_version_prefix():
+    client = TestClient(app.app)
+    assert client.get("/v2/question-bank").status_code == 200
+    assert client.get("/v3/question-bank").status_code == 200
+    assert client.post("/v2/score-test/batch", json={}).status_code == 422
+    client.get("/v2/inconnue-1")
+    client.get("/v2/inconnue-2")
+
+    text = render()
+    assert series(text, "/v2/question-bank", "200")
+    assert series(text, "/v3/question-bank", "200")
+    assert series(text, "/v2/score-test/batch", "422")
+    assert not series(text, "/question-bank", "200")
+    # Routes communes, sans préfixe ; URL inconnues regroupées
+    assert client.get("/scheduler").status_code == 200
+    text = render()
+    assert series(text, "/scheduler", "200")
+    assert series(text, "non_routee", "404") and "inconnue" not in text
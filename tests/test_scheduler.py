@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from scheduler import LLMScheduler
+
+
+def rate_limit_error() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.test/v1/chat/completions"))
+    return openai.RateLimitError("Too Many Requests", response=response, body=None)
+
+
+def scheduler(name: str, **kwargs) -> LLMScheduler:
+    return LLMScheduler(f"test_{name}", rpm=1_000_000, tpm=1_000_000_000, **kwargs)
+
+
+def test_cancelled_waiter_gives_back_its_slot():
+    async def scenario():
+        s = scheduler("annulation", max_concurrency=1)
+        await s.acquire(10)
+        waiting = asyncio.ensure_future(s.acquire(10))
+        await asyncio.sleep(0)
+        assert s.stats()["file"] == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        s.release(0.0)
+        assert s.stats()["file"] == 0
+        assert s.stats()["en_cours"] == 0
+
+        # La place est de nouveau libre pour le suivant
+        await asyncio.wait_for(s.acquire(10), 1)
+        assert s.stats()["en_cours"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_slot_granted_during_cancellation_is_released():
+    async def scenario():
+        s = scheduler("course", max_concurrency=1)
+        await s.acquire(10)
+        waiting = asyncio.ensure_future(s.acquire(10))
+        await asyncio.sleep(0)
+
+        # La place est accordée puis la tâche annulée avant d'avoir repris la main
+        s.release(0.0)
+        assert s.stats()["en_cours"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert s.stats()["en_cours"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_halves_concurrency():
+    async def scenario():
+        s = scheduler("429", max_retries=0)
+        before = s.limit
+
+        async def throttled():
+            raise rate_limit_error()
+
+        with pytest.raises(openai.RateLimitError):
+            await s.run(throttled, tokens=10)
+        assert s.limit == before / 2
+        assert s.throttled == 1
+        assert s.stats()["en_cours"] == 0
+
+        for _ in range(10):
+            with pytest.raises(openai.RateLimitError):
+                await s.run(throttled, tokens=10)
+        assert s.limit == 1.0
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_is_retried_after_backoff():
+    async def scenario():
+        s = scheduler("rejeu", max_retries=2, base_delay=0.001)
+        calls = []
+
+        async def flaky():
+            calls.append(None)
+            if len(calls) == 1:
+                raise rate_limit_error()
+            return "ok"
+
+        assert await s.run(flaky, tokens=10) == "ok"
+        assert len(calls) == 2
+        assert s.retries == 1
+        assert s.completed == 1
+
+    asyncio.run(scenario())
+
+
+def test_defaults_admit_hundreds_of_calls_at_once():
+    async def scenario():
+        s = LLMScheduler("test_defauts")
+
+        async def upstream():
+            await asyncio.sleep(0.2)
+
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(s.run(upstream, tokens=1000) for _ in range(400)))
+        # Pas de quota configuré ni de démarrage lent : tous les appels partent ensemble
+        assert asyncio.get_running_loop().time() - start < 1.0
+        assert s.limit == s.max_concurrency
+
+    asyncio.run(scenario())
+
+
+def test_initial_concurrency_from_env(monkeypatch):
+    from scheduler import scheduler_from_env
+
+    monkeypatch.setenv("TESTENV_MAX_CONCURRENCY", "100")
+    monkeypatch.setenv("TESTENV_INITIAL_CONCURRENCY", "10")
+    s = scheduler_from_env("TESTENV")
+    assert (s.max_concurrency, s.limit) == (100, 10.0)
+    assert s._requests.wait(10_000) == 0.0 and s._tokens.wait(10 ** 9) == 0.0
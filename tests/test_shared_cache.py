@@ -0,0 +1,88 @@
+import multiprocessing
+import time
+
+from cache import SharedCache
+
+KEYS = [f"cle-{i}" for i in range(16)]
+
+
+def payload(key: str, writer: int, n: int) -> dict:
+    # Taille variable : une lecture déchirée mélangerait en-tête et contenu de deux écritures
+    return {"cle": key, "ecrivain": writer, "n": n, "texte": f"{writer}:{n}:" * (1 + n % 50)}
+
+
+def consistent(key: str, value: dict) -> bool:
+    return value["cle"] == key and value["texte"] == f"{value['ecrivain']}:{value['n']}:" * (1 + value["n"] % 50)
+
+
+def write_loop(path: str, writer: int, seconds: float) -> None:
+    cache = SharedCache(path, slots=128, slot_size=2048, ways=8)
+    deadline = time.monotonic() + seconds
+    n = 0
+    while time.monotonic() < deadline:
+        for key in KEYS:
+            cache.set(key, payload(key, writer, n))
+        n += 1
+
+
+def read_loop(path: str, seconds: float, result) -> None:
+    cache = SharedCache(path, slots=128, slot_size=2048, ways=8)
+    deadline = time.monotonic() + seconds
+    seen = torn = 0
+    while time.monotonic() < deadline:
+        for key in KEYS:
+            value = cache.get(key)
+            if value is not None:
+                seen += 1
+                torn += not consistent(key, value)
+    result.put((seen, torn))
+
+
+def test_reads_from_two_processes_under_concurrent_sets(tmp_path):
+    path = str(tmp_path / "partage.bin")
+    SharedCache(path, slots=128, slot_size=2048, ways=8)  # fichier créé avant les workers
+    ctx = multiprocessing.get_context("fork")
+    result = ctx.Queue()
+    writers = [ctx.Process(target=write_loop, args=(path, w, 1.0)) for w in (1, 2)]
+    readers = [ctx.Process(target=read_loop, args=(path, 1.0, result)) for _ in range(2)]
+    for p in writers + readers:
+        p.start()
+    counts = [result.get(timeout=30) for _ in readers]
+    for p in writers + readers:
+        p.join(timeout=30)
+        assert p.exitcode == 0
+
+    assert all(seen > 0 for seen, _ in counts)
+    assert sum(torn for _, torn in counts) == 0
+
+    # Chaque clé est lisible depuis un nouveau processus, écrite par l'un des deux workers
+    cache = SharedCache(path, slots=128, slot_size=2048, ways=8)
+    for key in KEYS:
+        value = cache.get(key)
+        assert value is not None and consistent(key, value) and value["ecrivain"] in (1, 2)
+
+
+def test_full_set_evicts_least_recently_read(tmp_path):
+    cache = SharedCache(str(tmp_path / "lru.bin"), slots=4, slot_size=256, ways=4)
+    for i in range(4):
+        cache.set(f"k{i}", {"i": i})
+    assert len(cache) == 4 and cache.evictions == 0
+
+    assert cache.get("k0") == {"i": 0}  # k0 relu : k1 devient la plus ancienne
+    cache.set("k4", {"i": 4})
+
+    assert cache.evictions == 1
+    assert cache.get("k1") is None
+    for i in (0, 2, 3, 4):
+        assert cache.get(f"k{i}") == {"i": i}
+    assert len(cache) == 4
+
+
+def test_overwrite_of_same_key_does_not_evict(tmp_path):
+    cache = SharedCache(str(tmp_path / "meme.bin"), slots=4, slot_size=256, ways=4)
+    for i in range(4):
+        cache.set(f"k{i}", {"i": i})
+    cache.set("k2", {"i": 20})
+    assert cache.evictions == 0
+    assert cache.get("k2") == {"i": 20}
+    assert len(cache) == 4